@@ -0,0 +1,262 @@
+"""
+IVF (inverted file) approximate nearest-neighbour index for large galleries.
+
+The gallery is clustered with k-means into `nlist` cells. A query is
+compared against the cell centroids first and only the vectors of the
+`nprobe` closest cells are scanned exactly, so `nprobe` trades recall for
+latency (nprobe == nlist is an exact search).
+
+Build a campus-wide index from every cached course/semester gallery:
+    python ann_index.py build --out embeddings/campus_ivf.npz [--nlist 256]
+"""
+import argparse
+import glob
+import os
+import time
+
+import numpy as np
+
+from gallery import METRICS
+
+
+def _sq_dists(a, b, b_sq=None):
+    if b_sq is None:
+        b_sq = np.einsum("ij,ij->i", b, b)
+    a_sq = np.einsum("ij,ij->i", a, a)
+    d2 = a_sq[:, None] + b_sq[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(d2, 0.0, out=d2)
+
+
+def _normalize(x):
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+
+def kmeans(data, k, iters=20, seed=0, max_train=256):
+    """Plain Lloyd k-means on at most max_train * k sampled points. Returns centroids."""
+    rng = np.random.default_rng(seed)
+    n = data.shape[0]
+
+    if n > max_train * k:
+        data = data[rng.choice(n, max_train * k, replace=False)]
+        n = data.shape[0]
+
+    centroids = data[rng.choice(n, k, replace=False)].copy()
+    for _ in range(iters):
+        assign = np.argmin(_sq_dists(data, centroids), axis=1)
+        counts = np.bincount(assign, minlength=k)
+
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+
+        # Re-seed empty cells with random points so no list stays unused
+        empty = np.flatnonzero(~nonempty)
+        if len(empty):
+            centroids[empty] = data[rng.choice(n, len(empty), replace=False)]
+
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file index over gallery embeddings.
+
+    Offers the same search/match/best_match/top_k interface as Gallery so
+    it can be used as a drop-in matcher in face_rec.py.
+    """
+
+    def __init__(self, names, vectors, centroids, offsets, metric="euclidean", nprobe=8):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+
+        # names/vectors are stored grouped by cell: cell c owns rows offsets[c]:offsets[c+1]
+        self.names = list(names)
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.metric = metric
+        self.nprobe = nprobe
+
+        self.sq_norms = np.einsum("ij,ij->i", self.vectors, self.vectors)
+        self.centroid_sq_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def nlist(self):
+        return self.centroids.shape[0]
+
+    def __len__(self):
+        return len(self.names)
+
+    @classmethod
+    def build(cls, names, embeddings, nlist=None, metric="euclidean", nprobe=8, iters=20, seed=0):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if metric == "cosine":
+            vectors = _normalize(vectors)
+
+        n = vectors.shape[0]
+        if nlist is None:
+            nlist = max(1, int(4 * np.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+
+        centroids = kmeans(vectors, nlist, iters=iters, seed=seed)
+        assign = np.argmin(_sq_dists(vectors, centroids), axis=1)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+        names = [names[i] for i in order]
+        return cls(names, vectors[order], centroids, offsets, metric=metric, nprobe=nprobe)
+
+    @classmethod
+    def from_gallery(cls, gallery, **kwargs):
+        kwargs.setdefault("metric", gallery.metric)
+        # One indexed row per prototype; a hit on any of them names its owner
+        return cls.build(gallery.row_names, gallery.matrix, **kwargs)
+
+    def search(self, queries, k=1, nprobe=None):
+        """
+        Approximate top-k for each query, scanning the nprobe closest cells.
+
+        Returns (indices, distances) shaped (Q, k); indices point into
+        self.names. Rows are padded with -1 / inf when the probed cells hold
+        fewer than k vectors.
+        """
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.metric == "cosine":
+            q = _normalize(q)
+
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        k = min(k, len(self))
+
+        indices = np.full((q.shape[0], k), -1, dtype=np.int64)
+        distances = np.full((q.shape[0], k), np.inf, dtype=np.float32)
+        if k == 0:
+            return indices, distances
+
+        coarse = _sq_dists(q, self.centroids, self.centroid_sq_norms)
+        if nprobe < self.nlist:
+            probes = np.argpartition(coarse, nprobe - 1, axis=1)[:, :nprobe]
+        else:
+            probes = np.broadcast_to(np.arange(self.nlist), coarse.shape)
+
+        for row, cells in enumerate(probes):
+            candidates = np.concatenate(
+                [np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells]
+            )
+            if len(candidates) == 0:
+                continue
+
+            d2 = _sq_dists(q[row:row + 1], self.vectors[candidates], self.sq_norms[candidates])[0]
+            kk = min(k, len(candidates))
+            top = np.argpartition(d2, kk - 1)[:kk] if kk < len(candidates) else np.arange(kk)
+            top = top[np.argsort(d2[top])]
+
+            indices[row, :kk] = candidates[top]
+            distances[row, :kk] = d2[top]
+
+        # Stored vectors are unit length for cosine, so |a-b|^2 = 2 - 2cos
+        if self.metric == "cosine":
+            distances = distances / 2.0
+        else:
+            distances = np.sqrt(distances)
+        return indices, distances
+
+    def top_k(self, embedding, k=5, nprobe=None):
+        idx, dist = self.search(embedding, k, nprobe)
+        return [(self.names[i], float(d)) for i, d in zip(idx[0], dist[0]) if i >= 0]
+
+    def match(self, queries, threshold, nprobe=None):
+        idx, dist = self.search(queries, 1, nprobe)
+        results = []
+        for row_idx, row_dist in zip(idx, dist):
+            if len(row_idx) == 0 or row_idx[0] < 0:
+                results.append((None, float("inf")))
+                continue
+            d = float(row_dist[0])
+            results.append((self.names[row_idx[0]] if d < threshold else None, d))
+        return results
+
+    def best_match(self, embedding, threshold=float("inf"), nprobe=None):
+        return self.match(embedding, threshold, nprobe)[0]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                names=np.array(self.names, dtype=str),
+                vectors=self.vectors,
+                centroids=self.centroids,
+                offsets=self.offsets,
+                metric=np.array(self.metric),
+                nprobe=np.array(self.nprobe),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, nprobe=None):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                [str(n) for n in data["names"]],
+                data["vectors"],
+                data["centroids"],
+                data["offsets"],
+                metric=str(data["metric"]),
+                nprobe=nprobe or int(data["nprobe"]),
+            )
+
+
+def load_cached_galleries(embeddings_dir, model_name="Facenet", metric="euclidean"):
+    """
+    Every cached course/semester gallery under embeddings_dir as one Gallery.
+
+    Photos are grouped into students the same way a class gallery is
+    (recognizer.student_prototypes), so a hit names the student
+    ("Annsh(22001008008)"), not the photo it came from ("Annsh(22001008008) side").
+    """
+    from gallery import Gallery
+    from recognizer import student_prototypes
+
+    prototypes = {}
+    for path in sorted(glob.glob(os.path.join(embeddings_dir, "**", f"{model_name}.npz"), recursive=True)):
+        with np.load(path, allow_pickle=False) as data:
+            if str(data["model"]) != model_name or len(data["names"]) == 0:
+                continue
+            images = {os.path.splitext(str(n))[0]: e for n, e in zip(data["names"], data["embeddings"])}
+        prototypes.update(student_prototypes(images))
+
+    return Gallery.from_dict(prototypes, metric=metric)
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build an index from the cached galleries")
+    build.add_argument("--embeddings-dir", default=os.path.join(base_dir, "embeddings"))
+    build.add_argument("--model", default="Facenet")
+    build.add_argument("--metric", default="euclidean", choices=METRICS)
+    build.add_argument("--nlist", type=int, default=None)
+    build.add_argument("--nprobe", type=int, default=8)
+    build.add_argument("--out", default=os.path.join(base_dir, "embeddings", "campus_ivf.npz"))
+    args = parser.parse_args()
+
+    gallery = load_cached_galleries(args.embeddings_dir, args.model, args.metric)
+    if not gallery.names:
+        print(f"❌ No cached galleries found under {args.embeddings_dir}. Run face_rec.py for each class first.")
+        return
+
+    start = time.perf_counter()
+    index = IVFIndex.from_gallery(gallery, nlist=args.nlist, nprobe=args.nprobe)
+    index.save(args.out)
+    print(f"✔ Indexed {len(index)} prototype(s) of {len(gallery.names)} student(s) into {index.nlist} cells in "
+          f"{time.perf_counter() - start:.2f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+def make_session(pool_size=4):
+    """requests.Session with a small keep-alive pool, shared by all backend calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class AttendanceSync:
+    """
+    Durable, batched attendance uploader.
+
+    mark() appends to a local SQLite journal (WAL mode) and returns at once;
+    a background thread waits batch_window seconds to collect more marks,
+    then sends everything pending in one POST /attendance/bulk over a pooled
+    session (falling back to per-row POST /attendance when the batch is
+    refused, so one bad row can't hold back the rest). Rows are deleted
+    only once the backend has accepted them (or reported a duplicate), so
+    marks made while the backend is down survive restarts and are replayed
+    on the next flush. A row that still fails after max_attempts sends is
+    moved to the journal's `failed` table with its last error instead of
+    being retried forever.
+    """
+
+    # Statuses that mean the backend (or the proxy in front of it) is down, not that a row is bad
+    UNAVAILABLE = (502, 503, 504)
+
+    def __init__(self, backend_url, journal_path, session=None, batch_window=0.5,
+                 max_batch=200, retry_interval=10.0, timeout=5, max_attempts=20):
+        self.backend_url = backend_url
+        self.session = session or make_session()
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+
+        self.db = sqlite3.connect(journal_path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                class_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                marked_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+            """
+        )
+        self.db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS failed (
+                id INTEGER PRIMARY KEY,
+                student_id INTEGER NOT NULL,
+                class_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                marked_at TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                failed_at TEXT NOT NULL
+            )
+            """
+        )
+        self.db.commit()
+        self.db_lock = threading.Lock()
+
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="attendance-sync", daemon=True)
+
+        self.sent = 0
+        self.given_up = 0
+        self.failed_flushes = 0
+        self.last_latency_ms = 0.0
+        self.total_latency_ms = 0.0
+        self.flushes = 0
+
+    def start(self):
+        backlog = self.backlog()
+        if backlog:
+            print(f"Replaying {backlog} attendance mark(s) left in the journal")
+        self.thread.start()
+        self.wake.set()
+        return self
+
+    def mark(self, student_id, class_id=1, status="present"):
+        with self.db_lock:
+            self.db.execute(
+                "INSERT INTO pending (student_id, class_id, status, marked_at) VALUES (?, ?, ?, ?)",
+                (student_id, class_id, status, datetime.now(timezone.utc).isoformat()),
+            )
+            self.db.commit()
+        self.wake.set()
+
+    def backlog(self):
+        with self.db_lock:
+            return self.db.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    def stats(self):
+        return {
+            "backlog": self.backlog(),
+            "sent": self.sent,
+            "given_up": self.given_up,
+            "failed_flushes": self.failed_flushes,
+            "last_latency_ms": self.last_latency_ms,
+            "avg_latency_ms": self.total_latency_ms / self.flushes if self.flushes else 0.0,
+        }
+
+    def close(self, timeout=10.0):
+        """Stop the thread after one last flush attempt. Returns how many marks are still pending."""
+        self.stop_event.set()
+        self.wake.set()
+        self.thread.join(timeout)
+        remaining = self.backlog()
+        with self.db_lock:
+            self.db.close()
+        return remaining
+
+    # --- BACKGROUND FLUSH ---
+    def _run(self):
+        while True:
+            self.wake.wait(self.retry_interval)
+            stopping = self.stop_event.is_set()
+            if not stopping:
+                # Let a burst of recognitions land in the same batch
+                self.stop_event.wait(self.batch_window)
+            self.wake.clear()
+
+            while self._flush():
+                pass
+
+            if stopping or self.stop_event.is_set():
+                break
+
+    def _flush(self):
+        """Send one batch. Returns True when more pending rows may be sendable right away."""
+        with self.db_lock:
+            rows = self.db.execute(
+                "SELECT id, student_id, class_id, status, marked_at, attempts FROM pending ORDER BY id LIMIT ?",
+                (self.max_batch,),
+            ).fetchall()
+        if not rows:
+            return False
+
+        started = time.perf_counter()
+        done, errors = self._send([row[:5] for row in rows])
+        latency = (time.perf_counter() - started) * 1000
+
+        attempts = {row[0]: row[5] + 1 for row in rows}
+        exhausted = [row_id for row_id in errors if attempts[row_id] >= self.max_attempts]
+        with self.db_lock:
+            self.db.executemany("DELETE FROM pending WHERE id = ?", [(row_id,) for row_id in done])
+            self.db.executemany(
+                "UPDATE pending SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(error, row_id) for row_id, error in errors.items()],
+            )
+            # Out of attempts: park the row in `failed` so it stops blocking the queue but isn't lost
+            failed_at = datetime.now(timezone.utc).isoformat()
+            self.db.executemany(
+                "INSERT OR REPLACE INTO failed (id, student_id, class_id, status, marked_at, attempts, last_error, failed_at)"
+                " SELECT id, student_id, class_id, status, marked_at, attempts, last_error, ? FROM pending WHERE id = ?",
+                [(failed_at, row_id) for row_id in exhausted],
+            )
+            self.db.executemany("DELETE FROM pending WHERE id = ?", [(row_id,) for row_id in exhausted])
+            self.db.commit()
+
+        for row_id in exhausted:
+            print(f"❌ Attendance sync: gave up on mark {row_id} after {attempts[row_id]} attempt(s) ({errors[row_id]});"
+                  " kept in the journal's failed table")
+        self.given_up += len(exhausted)
+
+        self.sent += len(done)
+        self.last_latency_ms = latency
+        self.total_latency_ms += latency
+        self.flushes += 1
+        if errors:
+            self.failed_flushes += 1
+            if len(errors) > len(exhausted):
+                print(f"❌ Attendance sync: {len(errors) - len(exhausted)} mark(s) kept for retry ({next(iter(errors.values()))})")
+            return False
+        return len(rows) == self.max_batch
+
+    def _send(self, rows):
+        """Send a batch. Returns (ids to delete, {id: error} to retry)."""
+        payload = [
+            {"student_id": student_id, "class_id": class_id, "status": status, "marked_at": marked_at}
+            for _, student_id, class_id, status, marked_at in rows
+        ]
+        try:
+            res = self.session.post(f"{self.backend_url}/attendance/bulk", json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            return [], {row[0]: str(e) for row in rows}
+
+        if res.status_code == 200:
+            # Both "created" and "duplicate" mean the backend has the mark
+            return [row[0] for row in rows], {}
+        if res.status_code in self.UNAVAILABLE:
+            return [], {row[0]: f"{res.status_code} {res.text[:200]}" for row in rows}
+        # 4xx: older backend without /attendance/bulk, or a row it won't accept.
+        # 5xx: one row the database refuses fails the whole transaction.
+        # Either way, go row by row so the others still get through.
+        return self._send_each(rows)
+
+    def _send_each(self, rows):
+        done, errors = [], {}
+        for i, (row_id, student_id, class_id, status, marked_at) in enumerate(rows):
+            try:
+                res = self.session.post(
+                    f"{self.backend_url}/attendance",
+                    json={"student_id": student_id, "class_id": class_id, "status": status, "marked_at": marked_at},
+                    timeout=self.timeout,
+                )
+            except requests.RequestException as e:
+                # Backend unreachable: keep this row and everything after it
+                for rest_id, *_ in rows[i:]:
+                    errors[rest_id] = str(e)
+                break
+
+            if res.status_code in self.UNAVAILABLE:
+                for rest_id, *_ in rows[i:]:
+                    errors[rest_id] = f"{res.status_code} {res.text[:200]}"
+                break
+            if res.status_code == 200:
+                done.append(row_id)
+            elif 400 <= res.status_code < 500:
+                # The backend will never accept this row; don't retry it forever
+                print(f"❌ Attendance for student {student_id} rejected: {res.status_code} {res.text}")
+                done.append(row_id)
+            else:
+                errors[row_id] = f"{res.status_code} {res.text[:200]}"
+        return done, errors
@@ -0,0 +1,144 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+from face_batch import embed_faces
+
+
+class _Request:
+    __slots__ = ("faces", "submitted", "done", "result", "error")
+
+    def __init__(self, faces):
+        self.faces = faces
+        self.submitted = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class InferenceBatcher:
+    """
+    Shares one embedding model between many camera streams.
+
+    embed(faces) is called from each stream's inference thread and blocks
+    until its embeddings are ready. A single batcher thread takes the first
+    waiting request, gathers whatever else arrives within max_wait seconds
+    (up to max_batch faces), runs them through the model in one
+    predict_on_batch call and hands each stream back its own rows. With one
+    stream this costs at most max_wait per call; with several, faces from
+    different rooms share model calls instead of queueing behind each other.
+    """
+
+    def __init__(self, model, max_batch=32, max_wait=0.01):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+
+        self.requests = queue.Queue()
+        self.stopped = False
+        self.thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+
+        self.batches = 0
+        self.batched_requests = 0
+        self.faces = 0
+        self.model_ms = 0.0
+        self.wait_ms = 0.0
+        self.last_batch = 0
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stopped = True
+        self.requests.put(None)
+        self.thread.join(timeout)
+        # Nobody will serve these any more
+        while True:
+            try:
+                req = self.requests.get_nowait()
+            except queue.Empty:
+                break
+            if req is not None:
+                req.error = RuntimeError("inference batcher stopped")
+                req.done.set()
+
+    def embed(self, faces):
+        """(N, D) float32 embeddings for a list of face crops, computed in a shared batch."""
+        if not faces:
+            return embed_faces(self.model, [])
+        if self.stopped:
+            raise RuntimeError("inference batcher stopped")
+
+        req = _Request(faces)
+        self.requests.put(req)
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "faces": self.faces,
+            "avg_batch_faces": self.faces / self.batches if self.batches else 0.0,
+            "avg_batch_requests": self.batched_requests / self.batches if self.batches else 0.0,
+            "last_batch": self.last_batch,
+            "avg_model_ms": self.model_ms / self.batches if self.batches else 0.0,
+            "avg_wait_ms": self.wait_ms / self.batched_requests if self.batched_requests else 0.0,
+            "queued": self.requests.qsize(),
+        }
+
+    # --- BATCHER THREAD ---
+    def _run(self):
+        stopping = False
+        while not stopping:
+            req = self.requests.get()
+            if req is None:
+                break
+
+            batch = [req]
+            size = len(req.faces)
+            deadline = time.perf_counter() + self.max_wait
+            while size < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self.requests.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+                size += len(nxt.faces)
+
+            self._process(batch)
+
+    def _process(self, batch):
+        faces = [face for req in batch for face in req.faces]
+        started = time.perf_counter()
+        try:
+            embeddings = embed_faces(self.model, faces)
+        except Exception as e:
+            for req in batch:
+                req.error = e
+                req.done.set()
+            return
+        finished = time.perf_counter()
+
+        offset = 0
+        for req in batch:
+            req.result = np.ascontiguousarray(embeddings[offset:offset + len(req.faces)])
+            offset += len(req.faces)
+            self.wait_ms += (started - req.submitted) * 1000
+            req.done.set()
+
+        self.batches += 1
+        self.batched_requests += len(batch)
+        self.faces += len(faces)
+        self.last_batch = len(faces)
+        self.model_ms += (finished - started) * 1000
@@ -0,0 +1,79 @@
+"""
+Recall/latency benchmark: IVFIndex vs brute-force Gallery on synthetic embeddings.
+
+Identities are drawn from a Gaussian mixture (faces cluster by look-alikes
+rather than spreading uniformly) and each query is a noisy re-capture of a
+random enrolled identity.
+
+Usage:
+    python bench_ann.py [--n 20000] [--dim 128] [--queries 500] [--noise 1.0] [--metric euclidean]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from ann_index import IVFIndex
+from gallery import METRICS, Gallery
+
+
+def synthetic_gallery(n, dim, rng, clusters=1000):
+    centers = rng.normal(scale=1.5, size=(clusters, dim))
+    members = centers[rng.integers(0, clusters, size=n)]
+    return (members + rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=20_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--noise", type=float, default=1.0, help="per-dimension std of the re-capture noise")
+    parser.add_argument("--metric", default="euclidean", choices=METRICS)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    embeddings = synthetic_gallery(args.n, args.dim, rng)
+    names = [f"Student({i})" for i in range(args.n)]
+
+    truth_ids = rng.integers(0, args.n, size=args.queries)
+    queries = embeddings[truth_ids] + rng.normal(scale=args.noise, size=(args.queries, args.dim)).astype(np.float32)
+
+    gallery = Gallery(names, embeddings, metric=args.metric)
+    start = time.perf_counter()
+    for q in queries:
+        gallery.search(q, 1)
+    brute_ms = (time.perf_counter() - start) / args.queries * 1000
+    exact_idx, _ = gallery.search(queries, 1)
+    exact = [names[i] for i in exact_idx[:, 0]]
+
+    start = time.perf_counter()
+    index = IVFIndex.build(names, embeddings, nlist=args.nlist, metric=args.metric)
+    print(f"{args.n} identities, {index.nlist} cells, built in {time.perf_counter() - start:.2f}s")
+    print(f"brute force: {brute_ms:.3f} ms/query\n")
+    print(f"{'nprobe':>6} {'recall@1':>9} {'ms/query':>9} {'speedup':>8}")
+
+    nprobe = 1
+    while nprobe <= index.nlist:
+        start = time.perf_counter()
+        for q in queries:
+            index.search(q, 1, nprobe=nprobe)
+        ann_ms = (time.perf_counter() - start) / args.queries * 1000
+
+        idx, _ = index.search(queries, 1, nprobe=nprobe)
+        recall = np.mean([index.names[i] == e for i, e in zip(idx[:, 0], exact)])
+        print(f"{nprobe:>6} {recall:>9.3f} {ann_ms:>9.3f} {brute_ms / ann_ms:>7.1f}x")
+        nprobe *= 2
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench_ivf.npz")
+        index.save(path)
+        reloaded = IVFIndex.load(path)
+    assert reloaded.search(queries[:10], 1)[0].tolist() == index.search(queries[:10], 1)[0].tolist()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Embedding backend benchmark: latency, memory and agreement.
+
+Each backend is loaded in its own spawned process, so resident memory is
+measured without another runtime already in the process. Faces come from
+the enrolled images under --faces (largest detected face per image), or
+are synthetic if none are found. Agreement is measured against the
+reference backend: cosine similarity of each face's embedding, and whether
+each face has the same nearest neighbour among the others (what matching
+actually depends on).
+
+Usage:
+    python bench_backends.py [--backends deepface,onnx,onnx-int8,tflite,tflite-int8,stub]
+                             [--reference deepface] [--faces Faces] [--limit 64]
+                             [--batch 1,8,32] [--repeats 20]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from embedding_cache import IMAGE_EXTENSIONS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def rss_mb():
+    """(current, peak) resident set size in MB; nan where the platform doesn't report it (Windows)."""
+    try:
+        with open("/proc/self/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+        return int(fields["VmRSS"].split()[0]) / 1024, int(fields["VmHWM"].split()[0]) / 1024
+    except (OSError, KeyError):
+        pass
+    try:
+        import resource  # Unix only
+    except ImportError:
+        return float("nan"), float("nan")
+    # ru_maxrss is in KB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 1024)
+    return peak, peak
+
+
+def load_faces(faces_dir, limit):
+    from detector import FaceDetector
+    from embedder import enrollment_face
+
+    detector = FaceDetector()
+    faces = []
+    for root, _, files in os.walk(faces_dir):
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            image = cv2.imread(os.path.join(root, name))
+            if image is None:
+                continue
+            faces.append(enrollment_face(image, detector))
+            if len(faces) >= limit:
+                return faces
+    return faces
+
+
+def measure(spec, faces, batch_sizes, repeats):
+    """Runs in a fresh process: load one backend, time it, return its embeddings."""
+    from embedder import load_backend
+    from face_batch import embed_faces
+
+    kind, _, variant = spec.partition("-")
+    base_rss, _ = rss_mb()
+    started = time.perf_counter()
+    try:
+        model = load_backend(kind, int8=variant == "int8")
+        embed_faces(model, faces[:1])  # warm-up
+    except Exception as e:
+        return {"spec": spec, "error": f"{type(e).__name__}: {e}"}
+    load_s = time.perf_counter() - started
+    loaded_rss, _ = rss_mb()
+
+    latency = {}
+    for size in batch_sizes:
+        batch = [faces[i % len(faces)] for i in range(size)]
+        started = time.perf_counter()
+        for _ in range(repeats):
+            embed_faces(model, batch)
+        latency[size] = (time.perf_counter() - started) / repeats * 1000
+
+    embeddings = embed_faces(model, faces)
+    _, peak_rss = rss_mb()
+    return {
+        "spec": spec,
+        "name": model.name,
+        "load_s": load_s,
+        "model_mb": loaded_rss - base_rss,
+        "peak_mb": peak_rss,
+        "latency": latency,
+        "embeddings": embeddings,
+    }
+
+
+def nearest_neighbours(embeddings):
+    unit = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    sims = unit @ unit.T
+    np.fill_diagonal(sims, -np.inf)
+    return sims.argmax(axis=1)
+
+
+def agreement(reference, embeddings):
+    """(mean cosine, min cosine, nearest-neighbour agreement) against the reference embeddings."""
+    a = reference / np.maximum(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12)
+    b = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+    cosine = (a * b).sum(axis=1)
+    nn = np.mean(nearest_neighbours(reference) == nearest_neighbours(embeddings)) if len(a) > 1 else 1.0
+    return float(cosine.mean()), float(cosine.min()), float(nn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", default="deepface,onnx,onnx-int8,tflite,tflite-int8,stub")
+    parser.add_argument("--reference", default="deepface")
+    parser.add_argument("--faces", default=os.path.join(BASE_DIR, "Faces"))
+    parser.add_argument("--limit", type=int, default=64)
+    parser.add_argument("--batch", default="1,8,32")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    specs = [s.strip() for s in args.backends.split(",") if s.strip()]
+    batch_sizes = [int(b) for b in args.batch.split(",")]
+
+    faces = load_faces(args.faces, args.limit) if os.path.isdir(args.faces) else []
+    if faces:
+        print(f"{len(faces)} face(s) from {args.faces}")
+    else:
+        rng = np.random.default_rng(0)
+        faces = [rng.integers(0, 256, size=(160, 160, 3), dtype=np.uint8) for _ in range(args.limit)]
+        print(f"No images under {args.faces}; using {len(faces)} synthetic crops (agreement is not meaningful)")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for spec in specs:
+        with ctx.Pool(1) as pool:
+            result = pool.apply(measure, (spec, faces, batch_sizes, args.repeats))
+        results[spec] = result
+        if "error" in result:
+            print(f"⚠ {spec}: skipped ({result['error']})")
+
+    reference = results.get(args.reference)
+    if reference is None or "error" in reference:
+        reference = None
+        print(f"⚠ Reference backend {args.reference} unavailable; agreement not reported")
+
+    header = f"{'backend':<14} {'load s':>7} {'model MB':>9} {'peak MB':>8}"
+    header += "".join(f" {f'b={size} ms':>10}" for size in batch_sizes)
+    header += f" {'ms/face':>8} {'cos mean':>9} {'cos min':>8} {'NN agree':>9}"
+    print("\n" + header)
+    for spec, result in results.items():
+        if "error" in result:
+            continue
+        row = f"{spec:<14} {result['load_s']:>7.2f} {result['model_mb']:>9.0f} {result['peak_mb']:>8.0f}"
+        row += "".join(f" {result['latency'][size]:>10.1f}" for size in batch_sizes)
+        row += f" {result['latency'][batch_sizes[-1]] / batch_sizes[-1]:>8.2f}"
+        if reference is not None and result["embeddings"].shape == reference["embeddings"].shape:
+            mean_cos, min_cos, nn = agreement(reference["embeddings"], result["embeddings"])
+            row += f" {mean_cos:>9.4f} {min_cos:>8.4f} {nn:>9.3f}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: vectorized Gallery lookup vs the old per-student Python loop.
+
+Usage:
+    python bench_gallery.py [--dim 128] [--queries 16] [--repeat 50]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from gallery import Gallery
+
+
+def loop_match(embedding, known_embeddings):
+    # The matching code face_rec.py used before Gallery
+    min_dist = float("inf")
+    identity = None
+    for name, known_emb in known_embeddings.items():
+        dist = np.linalg.norm(embedding - np.array(known_emb))
+        if dist < min_dist:
+            min_dist = dist
+            identity = name
+    return identity, min_dist
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'identities':>10} {'loop 1q ms':>11} {'euclid 1q ms':>13} {'cosine 1q ms':>13} "
+          f"{'euclid {0}q ms'.format(args.queries):>14} {'top-5 1q ms':>12}")
+
+    for n in (100, 1_000, 10_000):
+        embeddings = rng.normal(size=(n, args.dim)).astype(np.float32)
+        names = [f"Student({i})" for i in range(n)]
+        known = {name: emb.tolist() for name, emb in zip(names, embeddings)}
+        query = embeddings[n // 2] + rng.normal(scale=0.1, size=args.dim).astype(np.float32)
+        batch = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+        euclid = Gallery(names, embeddings, metric="euclidean")
+        cosine = Gallery(names, embeddings, metric="cosine")
+        assert euclid.best_match(query)[0] == loop_match(np.array(query), known)[0]
+
+        loop_ms = timeit(lambda: loop_match(np.array(query), known), max(1, args.repeat // 10))
+        euclid_ms = timeit(lambda: euclid.best_match(query), args.repeat)
+        cosine_ms = timeit(lambda: cosine.best_match(query), args.repeat)
+        batch_ms = timeit(lambda: euclid.match(batch, float("inf")), args.repeat)
+        topk_ms = timeit(lambda: euclid.top_k(query, 5), args.repeat)
+
+        print(f"{n:>10} {loop_ms:>11.3f} {euclid_ms:>13.3f} {cosine_ms:>13.3f} {batch_ms:>14.3f} {topk_ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
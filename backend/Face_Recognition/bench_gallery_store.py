@@ -0,0 +1,99 @@
+"""
+Per-process memory of a gallery held privately vs mapped from a gallery file.
+
+For each gallery size, --workers spawned processes load the same gallery
+either as a private copy (np.load + Gallery, what each process did before)
+or by mapping the shared file (gallery_store.open_gallery), run a batch of
+lookups so every page is touched, and report their memory while all of
+them are alive. RSS counts mapped pages in every process that touches
+them; PSS splits shared pages between the processes and USS is what the
+process alone holds. With the mapped file USS grows only with the
+per-identity bookkeeping (names, norms), not with the matrix, and PSS
+shrinks as workers are added.
+
+Usage:
+    python bench_gallery_store.py [--sizes 1000,10000,50000,100000] [--dim 128] [--workers 4]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+
+import numpy as np
+
+
+def memory_mb():
+    """(rss, pss, uss) in MB from /proc/self/smaps_rollup (Linux)."""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+    return fields.get("Rss", 0.0), fields.get("Pss", 0.0), uss
+
+
+def worker(mode, path, npy_path, queries, barrier, results):
+    from gallery import Gallery
+    from gallery_store import open_gallery
+
+    before = memory_mb()
+    if mode == "mapped":
+        gallery, _ = open_gallery(path)
+    else:
+        gallery = Gallery([str(i) for i in range(len(np.load(npy_path, mmap_mode="r")))], np.load(npy_path))
+    gallery.search(queries, k=1)
+    barrier.wait()  # every worker holds its gallery now
+    after = memory_mb()
+    results.put(tuple(a - b for a, b in zip(after, before)))
+    barrier.wait()
+
+
+def run(mode, path, npy_path, queries, workers):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(mode, path, npy_path, queries, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    measured = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return np.mean(measured, axis=0)
+
+
+def main():
+    from gallery import Gallery
+    from gallery_store import save_gallery
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000,100000")
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=16)
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        raise SystemExit("Needs Linux /proc/self/smaps_rollup")
+
+    rng = np.random.default_rng(0)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    print(f"{args.workers} worker(s), dim {args.dim}; memory added per worker by its gallery (MB)")
+    print(f"{'faces':>8} {'matrix MB':>10} {'mode':>8} {'RSS':>8} {'PSS':>8} {'USS':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in (int(s) for s in args.sizes.split(",")):
+            embeddings = rng.standard_normal((size, args.dim)).astype(np.float32)
+            npy_path = os.path.join(tmp, f"{size}.npy")
+            path = os.path.join(tmp, f"{size}.gallery")
+            np.save(npy_path, embeddings)
+            save_gallery(path, Gallery([str(i) for i in range(size)], embeddings), "bench")
+
+            for mode in ("private", "mapped"):
+                rss, pss, uss = run(mode, path, npy_path, queries, args.workers)
+                print(f"{size:>8} {embeddings.nbytes / 2**20:>10.1f} {mode:>8} {rss:>8.1f} {pss:>8.1f} {uss:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Shared fixtures for the tests in this folder. Nothing here needs a real
+model: embeddings come from the stub backend (FACE_BACKEND=stub, see
+embedder.py).
+
+    cd backend/Face_Recognition && python -m pytest -q
+"""
+import os
+
+import numpy as np
+import pytest
+
+from embedder import load_backend
+from face_batch import embed_faces
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FACES_DIR = os.path.join(BASE_DIR, "Faces", "B.Tech - ECE", "7")
+
+
+def synthetic_faces(rng, students, photos, size=64, noise=12.0):
+    """{name: [BGR face crops]}: one random base face per student, photos are noisy copies of it."""
+    faces = {}
+    for s in range(students):
+        base = rng.integers(0, 256, (size, size, 3)).astype(np.float32)
+        faces[f"Student{s}({22001008000 + s})"] = [
+            np.clip(base + rng.normal(0, noise, base.shape), 0, 255).astype(np.uint8) for _ in range(photos)
+        ]
+    return faces
+
+
+@pytest.fixture(scope="session")
+def model():
+    return load_backend("stub")
+
+
+@pytest.fixture(scope="session")
+def faces_dir():
+    """The one real class folder in the repo: three students, one photo each."""
+    return FACES_DIR
+
+
+@pytest.fixture(scope="session")
+def stub_gallery(model):
+    """({name: (k, D) stub embeddings}, (Q, D) query embeddings, true names of the queries)."""
+    rng = np.random.default_rng(0)
+    faces = synthetic_faces(rng, students=40, photos=4)
+    rows = {name: embed_faces(model, crops[:3]) for name, crops in faces.items()}
+    names = list(faces)
+    queries = embed_faces(model, [faces[name][3] for name in names])
+    return rows, queries, names
@@ -0,0 +1,96 @@
+import os
+
+import cv2
+import numpy as np
+
+
+class FaceDetector:
+    """
+    Cheap Haar-cascade face detector run on a downscaled grayscale frame.
+
+    This is the same cascade DeepFace's "opencv" backend uses, so crops
+    match the ones the gallery was enrolled with, but detection runs at
+    work_width pixels wide instead of full resolution. Frames with no face
+    are counted as gated and never reach the embedding model.
+    """
+
+    def __init__(self, work_width=480, scale_factor=1.1, min_neighbors=5, min_face=20, align=True):
+        self.face_cascade = cv2.CascadeClassifier(
+            os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        )
+        self.eye_cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_eye.xml"))
+        if self.face_cascade.empty() or self.eye_cascade.empty():
+            raise RuntimeError("Could not load OpenCV Haar cascades")
+
+        self.work_width = work_width
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_face = min_face
+        self.align = align
+
+        self.frames = 0
+        self.gated = 0
+        self.faces = 0
+
+    def detect(self, frame):
+        """Face boxes (x, y, w, h) in full-frame coordinates."""
+        self.frames += 1
+
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / w)
+        small = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA) if scale < 1 else frame
+        gray = cv2.equalizeHist(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+
+        found = self.face_cascade.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=(self.min_face, self.min_face),
+        )
+        boxes = [(int(x / scale), int(y / scale), int(bw / scale), int(bh / scale)) for x, y, bw, bh in found]
+
+        if not boxes:
+            self.gated += 1
+        self.faces += len(boxes)
+        return boxes
+
+    def crop(self, frame, box, eyes=None):
+        """Full-resolution crop of one box, eye-aligned when align is on (eyes: find_eyes() result, if known)."""
+        face = self.raw_crop(frame, box)
+        return self.align_eyes(face, eyes) if self.align and face.size else face
+
+    def raw_crop(self, frame, box):
+        x, y, w, h = box
+        x, y = max(0, x), max(0, y)
+        return frame[y:y + h, x:x + w]
+
+    def find_eyes(self, face):
+        """The two largest eye boxes in the upper half of a face crop, left to right; [] if two aren't found."""
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY)
+        eyes = self.eye_cascade.detectMultiScale(gray[: face.shape[0] // 2], 1.1, 10)
+        if len(eyes) < 2:
+            return []
+        eyes = sorted(eyes, key=lambda e: e[2] * e[3], reverse=True)[:2]
+        return sorted(eyes, key=lambda e: e[0])
+
+    def align_eyes(self, face, eyes=None):
+        """Rotate a face crop so the eyes are level; returned unchanged if two eyes aren't found."""
+        if eyes is None:
+            eyes = self.find_eyes(face)
+        if len(eyes) < 2:
+            return face
+
+        (lx, ly, lw, lh), (rx, ry, rw, rh) = eyes
+        angle = np.degrees(np.arctan2((ry + rh / 2) - (ly + lh / 2), (rx + rw / 2) - (lx + lw / 2)))
+
+        center = (face.shape[1] / 2, face.shape[0] / 2)
+        rotation = cv2.getRotationMatrix2D(center, angle, 1.0)
+        return cv2.warpAffine(face, rotation, (face.shape[1], face.shape[0]))
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "gated": self.gated,
+            "faces": self.faces,
+            "gated_pct": 100.0 * self.gated / self.frames if self.frames else 0.0,
+        }
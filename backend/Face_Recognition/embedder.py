@@ -0,0 +1,286 @@
+"""
+Embedding backends: the same Facenet embedding from different runtimes.
+
+    deepface  Keras model from DeepFace.build_model (default)
+    onnx      Facenet exported to ONNX, run with ONNX Runtime on CPU
+    tflite    Facenet converted to TensorFlow Lite
+    stub      deterministic random projection, no model files (tests, CI)
+
+Chosen with FACE_BACKEND; FACE_BACKEND_INT8=True picks the quantized onnx /
+tflite file. Every backend exposes input_shape, output_shape, name (used as
+the embedding cache key, so galleries are never mixed across backends),
+predict_batch(batch) and represent(img_path) for enrollment images. All of
+them preprocess enrollment images the same way (enrollment_face, then
+resize_face), whether one at a time, in enroll.py's batches or in the
+recognition pool, so a cached embedding doesn't depend on which path built it.
+
+Export the model files once (needs tensorflow, tf2onnx, onnxruntime):
+    python embedder.py export --format onnx [--int8]
+    python embedder.py export --format tflite [--int8]
+"""
+import argparse
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from face_batch import resize_face
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.environ.get("FACE_MODEL_DIR", os.path.join(BASE_DIR, "models"))
+BACKENDS = ("deepface", "onnx", "tflite", "stub")
+
+
+def limit_threads(threads):
+    """
+    Cap the math libraries of a pool process at `threads` threads, so N
+    processes don't each spin up a full-width pool. Call before the backend
+    is loaded (TensorFlow reads these at import); explicit settings win.
+    """
+    os.environ.setdefault("OMP_NUM_THREADS", str(threads))
+    os.environ.setdefault("TF_NUM_INTRAOP_THREADS", str(threads))
+    os.environ.setdefault("TF_NUM_INTEROP_THREADS", "1")
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+
+def model_path(fmt, int8=False, model_dir=MODEL_DIR, model_name="Facenet"):
+    suffix = ".int8" if int8 else ""
+    return os.path.join(model_dir, f"{model_name.lower()}{suffix}.{fmt}")
+
+
+def resolve_backend(kind=None, int8=None):
+    """(kind, int8) with FACE_BACKEND / FACE_BACKEND_INT8 filling in what isn't given."""
+    kind = (kind or os.environ.get("FACE_BACKEND", "deepface")).lower()
+    if int8 is None:
+        int8 = os.environ.get("FACE_BACKEND_INT8", "False") == "True"
+    return kind, int8 and kind in ("onnx", "tflite")
+
+
+def backend_name(kind=None, int8=None, model_name="Facenet"):
+    """Name a backend will report (its embedding cache key), without loading it."""
+    kind, int8 = resolve_backend(kind, int8)
+    if kind == "deepface":
+        return model_name
+    if kind == "stub":
+        return "stub"
+    return f"{model_name}-{kind}" + ("-int8" if int8 else "")
+
+
+def largest_face(image, detector):
+    """Largest detected face of an image, aligned; None if no face is found."""
+    boxes = detector.detect(image)
+    if not boxes:
+        return None
+    return detector.crop(image, max(boxes, key=lambda b: b[2] * b[3]))
+
+
+def enrollment_face(image, detector):
+    """Largest detected face of an enrollment image, aligned; the whole image if no face is found."""
+    face = largest_face(image, detector)
+    return image if face is None else face
+
+
+class EmbeddingBackend:
+    """
+    Base class: input_shape (h, w), output_shape (D), name, predict_batch(batch) -> (N, D).
+    One backend object is shared by every thread of a process (inference
+    threads, the batcher, gallery loads and watchers), so predict_batch and
+    represent must be safe to call concurrently.
+    """
+
+    name = None
+    input_shape = (160, 160)
+    output_shape = 128
+    detector = None
+    detector_lock = threading.Lock()
+
+    def predict_batch(self, batch):
+        raise NotImplementedError
+
+    def represent(self, img_path):
+        """Embedding of the largest face in an image file (the whole image if none is found), or None."""
+        from detector import FaceDetector
+
+        image = cv2.imread(img_path)
+        if image is None:
+            return None
+        # The cascades are shared, and OpenCV doesn't promise they can run on two threads at once
+        with self.detector_lock:
+            if self.detector is None:
+                self.detector = FaceDetector()
+            face = enrollment_face(image, self.detector)
+        batch = resize_face(face, self.input_shape)[np.newaxis]
+        return np.asarray(self.predict_batch(batch), dtype=np.float32)[0]
+
+
+class DeepFaceBackend(EmbeddingBackend):
+    """The Keras model DeepFace builds, fed the same preprocessed crops as the other backends."""
+
+    def __init__(self, model_name="Facenet"):
+        from deepface import DeepFace
+
+        self.name = model_name
+        self.client = DeepFace.build_model(model_name)
+        self.input_shape = tuple(self.client.input_shape)
+        self.output_shape = self.client.output_shape
+
+    def predict_batch(self, batch):
+        return self.client.model.predict_on_batch(batch)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime on CPU, graph optimizations on."""
+
+    def __init__(self, path, threads=None, model_name="Facenet"):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The onnx backend needs onnxruntime: pip install onnxruntime") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_shape = tuple(inp.shape[1:3])
+        self.output_shape = self.session.get_outputs()[0].shape[-1]
+        self.name = f"{model_name}-onnx" + ("-int8" if ".int8." in os.path.basename(path) else "")
+
+    def predict_batch(self, batch):
+        return self.session.run(None, {self.input_name: np.asarray(batch, dtype=np.float32)})[0]
+
+
+class TFLiteBackend(EmbeddingBackend):
+    """
+    TensorFlow Lite interpreter; the input is resized whenever the batch size
+    changes. An interpreter holds its tensors in place and isn't thread-safe,
+    so calls are serialized.
+    """
+
+    def __init__(self, path, threads=None, model_name="Facenet"):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            try:
+                import tensorflow as tf
+            except ImportError as e:
+                raise ImportError("The tflite backend needs tflite-runtime or tensorflow") from e
+            Interpreter = tf.lite.Interpreter
+
+        self.interpreter = Interpreter(model_path=path, num_threads=threads)
+        self.interpreter.allocate_tensors()
+        inp = self.interpreter.get_input_details()[0]
+        out = self.interpreter.get_output_details()[0]
+        self.input_index = inp["index"]
+        self.output_index = out["index"]
+        self.input_shape = tuple(int(d) for d in inp["shape"][1:3])
+        self.output_shape = int(out["shape"][-1])
+        self.batch_size = int(inp["shape"][0])
+        self.lock = threading.Lock()
+        self.name = f"{model_name}-tflite" + ("-int8" if ".int8." in os.path.basename(path) else "")
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self.lock:
+            if len(batch) != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = len(batch)
+            self.interpreter.set_tensor(self.input_index, batch)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+class StubBackend(EmbeddingBackend):
+    """
+    Deterministic stand-in: each face is shrunk to 16x16 grey and multiplied
+    by a fixed seeded projection. Same pixels give the same embedding and
+    similar faces land close together, with no model download.
+    """
+
+    name = "stub"
+
+    def __init__(self, output_shape=128, seed=0):
+        self.output_shape = output_shape
+        rng = np.random.default_rng(seed)
+        self.projection = rng.standard_normal((256, output_shape)).astype(np.float32) / 16.0
+
+    def predict_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        small = np.stack([cv2.resize(cv2.cvtColor(face, cv2.COLOR_BGR2GRAY), (16, 16), interpolation=cv2.INTER_AREA)
+                          for face in batch])
+        return small.reshape(len(batch), -1) @ self.projection
+
+
+def load_backend(kind=None, int8=None, model_dir=None, threads=None, model_name="Facenet"):
+    """Backend named by kind (default: FACE_BACKEND, else deepface)."""
+    kind, int8 = resolve_backend(kind, int8)
+    model_dir = model_dir or MODEL_DIR
+    if threads is None and os.environ.get("FACE_BACKEND_THREADS"):
+        threads = int(os.environ["FACE_BACKEND_THREADS"])
+
+    if kind == "deepface":
+        return DeepFaceBackend(model_name)
+    if kind == "stub":
+        return StubBackend()
+    if kind in ("onnx", "tflite"):
+        path = model_path(kind, int8, model_dir, model_name)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run: python embedder.py export --format {kind}"
+                                    + (" --int8" if int8 else ""))
+        cls = OnnxBackend if kind == "onnx" else TFLiteBackend
+        return cls(path, threads=threads, model_name=model_name)
+    raise ValueError(f"Unknown embedding backend {kind!r}; expected one of {', '.join(BACKENDS)}")
+
+
+# --- EXPORT ---
+def export(fmt, int8=False, model_dir=MODEL_DIR, model_name="Facenet"):
+    """Convert the DeepFace Keras model to an onnx/tflite file. int8 uses dynamic-range weight quantization."""
+    import tensorflow as tf
+    from deepface import DeepFace
+
+    client = DeepFace.build_model(model_name)
+    h, w = client.input_shape
+    os.makedirs(model_dir, exist_ok=True)
+    out = model_path(fmt, int8, model_dir, model_name)
+
+    if fmt == "onnx":
+        import tf2onnx
+
+        fp32_path = model_path("onnx", False, model_dir, model_name)
+        spec = (tf.TensorSpec((None, h, w, 3), tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(client.model, input_signature=spec, output_path=fp32_path)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+
+            quantize_dynamic(fp32_path, out, weight_type=QuantType.QInt8)
+    elif fmt == "tflite":
+        converter = tf.lite.TFLiteConverter.from_keras_model(client.model)
+        if int8:
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        with open(out, "wb") as f:
+            f.write(converter.convert())
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}")
+
+    print(f"✔ Exported {model_name} to {out} ({os.path.getsize(out) / 1e6:.1f} MB)")
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    exp = sub.add_parser("export", help="export the DeepFace model for the onnx/tflite backends")
+    exp.add_argument("--format", choices=("onnx", "tflite"), required=True)
+    exp.add_argument("--int8", action="store_true", help="also quantize weights to int8")
+    exp.add_argument("--model-dir", default=MODEL_DIR)
+    args = parser.parse_args()
+    export(args.format, args.int8, args.model_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents, read in chunks."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def list_gallery_images(faces_dir):
+    """Image file names inside a Faces/<course>/<semester> folder, sorted."""
+    return sorted(
+        name
+        for name in os.listdir(faces_dir)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+        and os.path.isfile(os.path.join(faces_dir, name))
+    )
+
+
+def check_class(course, semester):
+    """
+    Raise ValueError unless course and semester are each a single folder
+    name. They come from API requests and are joined into paths that get
+    written (Faces/, embeddings/), so "..", separators and the like are refused.
+    """
+    for part in (course, semester):
+        if not isinstance(part, str) or part.strip() in ("", ".", "..") or any(c in part for c in "/\\\0"):
+            raise ValueError(f"Invalid course/semester name: {part!r}")
+
+
+def cache_path_for(base_dir, course, semester, model_name):
+    check_class(course, semester)
+    return os.path.join(base_dir, "embeddings", course, semester, f"{model_name}.npz")
+
+
+class EmbeddingCache:
+    """
+    Persistent store of gallery embeddings for one Faces/<course>/<semester> folder.
+
+    Entries are keyed by the image's file name and validated against its
+    mtime/size; if those changed, the content hash decides whether the
+    stored embedding is still usable. The whole store is invalidated when
+    the model name differs from the one it was built with.
+    """
+
+    # 2: every backend enrolls through embedder.enrollment_face (deepface used DeepFace.represent)
+    VERSION = 2
+
+    def __init__(self, cache_path, model_name):
+        self.cache_path = cache_path
+        self.model_name = model_name
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def load(self):
+        if not os.path.exists(self.cache_path):
+            return self
+
+        try:
+            with np.load(self.cache_path, allow_pickle=False) as data:
+                if int(data["version"]) != self.VERSION or str(data["model"]) != self.model_name:
+                    print(f"Embedding cache {self.cache_path} is for another model/version, rebuilding.")
+                    self.dirty = True
+                    return self
+
+                for name, mtime_ns, size, digest, embedding in zip(
+                    data["names"], data["mtimes"], data["sizes"], data["hashes"], data["embeddings"]
+                ):
+                    self.entries[str(name)] = {
+                        "mtime_ns": int(mtime_ns),
+                        "size": int(size),
+                        "sha1": str(digest),
+                        "embedding": embedding,
+                    }
+        except Exception as e:
+            print(f"⚠ Ignoring unreadable embedding cache {self.cache_path}: {e}")
+            self.entries = {}
+            self.dirty = True
+
+        return self
+
+    def get(self, name, img_path):
+        """Return the cached embedding for an image, or None if it must be re-encoded."""
+        entry = self.entries.get(name)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        st = os.stat(img_path)
+        if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            self.hits += 1
+            return entry["embedding"]
+
+        # File was touched (copied, checked out again...) - compare contents
+        if entry["sha1"] == file_digest(img_path):
+            entry["mtime_ns"] = st.st_mtime_ns
+            entry["size"] = st.st_size
+            self.dirty = True
+            self.hits += 1
+            return entry["embedding"]
+
+        self.misses += 1
+        return None
+
+    def put(self, name, img_path, embedding):
+        st = os.stat(img_path)
+        self.entries[name] = {
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+            "sha1": file_digest(img_path),
+            "embedding": np.asarray(embedding, dtype=np.float32),
+        }
+        self.dirty = True
+
+    def prune(self, live_names):
+        """Drop entries whose image no longer exists. Returns the removed names."""
+        live_names = set(live_names)
+        stale = [name for name in self.entries if name not in live_names]
+        for name in stale:
+            del self.entries[name]
+        if stale:
+            self.dirty = True
+        return stale
+
+    def save(self):
+        if not self.dirty:
+            return
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+
+        names = sorted(self.entries)
+        if names:
+            embeddings = np.stack([self.entries[n]["embedding"] for n in names]).astype(np.float32)
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+
+        # Write to a temp file first so a crash never leaves a truncated cache;
+        # a unique one, so processes saving the same cache don't clobber each other
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.cache_path),
+                                        prefix=os.path.basename(self.cache_path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    version=np.array(self.VERSION),
+                    model=np.array(self.model_name),
+                    names=np.array(names, dtype=str),
+                    mtimes=np.array([self.entries[n]["mtime_ns"] for n in names], dtype=np.int64),
+                    sizes=np.array([self.entries[n]["size"] for n in names], dtype=np.int64),
+                    hashes=np.array([self.entries[n]["sha1"] for n in names], dtype=str),
+                    embeddings=embeddings,
+                )
+            os.replace(tmp_path, self.cache_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.dirty = False
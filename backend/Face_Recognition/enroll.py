@@ -0,0 +1,189 @@
+"""
+Prebuild gallery embeddings ahead of class time, in parallel.
+
+Finds every image the embedding cache doesn't cover yet (new or changed
+files), spreads them over a pool of processes that each load the
+embedding backend once, and embeds each chunk with one batched model call
+(Haar face crop + predict_batch) instead of DeepFace's per-image pipeline.
+Results go into the same per-folder cache face_rec.py and worker.py read,
+so the next start only loads them, and each class's shared gallery file
+(gallery_store.py) is republished for the recognition pool to map.
+
+Usage:
+    python enroll.py --all [--workers 4] [--batch 16] [--backend deepface]
+    python enroll.py "B.Tech - ECE" 7 [--rebuild]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+
+from embedding_cache import EmbeddingCache, cache_path_for, list_gallery_images
+from embedder import backend_name, enrollment_face, limit_threads
+from gallery import Gallery
+from gallery_store import file_lock, folder_source, gallery_path_for, read_header, save_gallery
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FACES_DIR = os.path.join(BASE_DIR, "Faces")
+
+# --- POOL PROCESS STATE (one backend per process) ---
+_model = None
+_detector = None
+
+
+def _init_worker(kind, int8, threads):
+    global _model, _detector
+    limit_threads(threads)
+
+    from detector import FaceDetector
+    from embedder import load_backend
+
+    _model = load_backend(kind, int8, threads=threads)
+    _detector = FaceDetector()
+
+
+def _encode_chunk(tasks):
+    """[(key, img_path)] -> [(key, embedding or None, error or None)], one model call per chunk."""
+    from face_batch import embed_faces
+
+    results = []
+    faces, keys = [], []
+    for key, img_path in tasks:
+        image = cv2.imread(img_path)
+        if image is None:
+            results.append((key, None, "unreadable image"))
+            continue
+        faces.append(enrollment_face(image, _detector))
+        keys.append(key)
+
+    if faces:
+        try:
+            embeddings = embed_faces(_model, faces)
+            results.extend((key, embedding, None) for key, embedding in zip(keys, embeddings))
+        except Exception as e:
+            results.extend((key, None, str(e)) for key in keys)
+    return results
+
+
+# --- FOLDERS ---
+def class_folders(course=None, semester=None):
+    """(course, semester) pairs with a Faces/<course>/<semester> folder; all of them by default."""
+    if course is not None:
+        return [(course, semester)]
+    folders = []
+    for course in sorted(os.listdir(FACES_DIR)):
+        course_dir = os.path.join(FACES_DIR, course)
+        if not os.path.isdir(course_dir):
+            continue
+        for semester in sorted(os.listdir(course_dir)):
+            if os.path.isdir(os.path.join(course_dir, semester)):
+                folders.append((course, semester))
+    return folders
+
+
+def publish_gallery(course, semester, cache, model_name):
+    """Write the class's shared gallery file (see gallery_store.py) unless it is already current. Returns its version."""
+    from recognizer import student_prototypes
+
+    source = folder_source(os.path.join(FACES_DIR, course, semester))
+    path = gallery_path_for(BASE_DIR, course, semester, model_name)
+    with file_lock(path + ".lock"):
+        header, _ = read_header(path)
+        if header is not None and header["source"] == source:
+            return header["version"]
+        images = {os.path.splitext(name)[0]: entry["embedding"] for name, entry in cache.entries.items()}
+        if not images:
+            return None
+        gallery = Gallery.from_dict(student_prototypes(images), metric=os.environ.get("FACE_METRIC", "euclidean"))
+        return save_gallery(path, gallery, model_name, source)
+
+
+def enroll(folders, kind=None, int8=None, workers=None, batch=16, rebuild=False):
+    """Encode every uncached image in the given class folders. Returns {"images", "cached", "encoded", "failed", "seconds"}."""
+    name = backend_name(kind, int8)
+    workers = workers or min(4, os.cpu_count() or 1)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    caches = {}
+    tasks = []
+    images = 0
+    for course, semester in folders:
+        faces_dir = os.path.join(FACES_DIR, course, semester)
+        if not os.path.isdir(faces_dir):
+            print(f"⚠ No folder {faces_dir}, skipping")
+            continue
+        cache = EmbeddingCache(cache_path_for(BASE_DIR, course, semester, name), name)
+        if not rebuild:
+            cache.load()
+        image_names = list_gallery_images(faces_dir)
+        cache.prune(image_names)
+        caches[(course, semester)] = cache
+        images += len(image_names)
+
+        for img_name in image_names:
+            img_path = os.path.join(faces_dir, img_name)
+            if rebuild or cache.get(img_name, img_path) is None:
+                tasks.append(((course, semester, img_name), img_path))
+
+    print(f"{images} image(s) in {len(caches)} folder(s), {len(tasks)} to encode with {name} "
+          f"on {workers} process(es) x {threads} thread(s), batch {batch}")
+
+    started = time.perf_counter()
+    encoded = failed = 0
+    if tasks:
+        chunks = [tasks[i:i + batch] for i in range(0, len(tasks), batch)]
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(kind, int8, threads)) as pool:
+            futures = [pool.submit(_encode_chunk, chunk) for chunk in chunks]
+            paths = dict(tasks)
+            for future in as_completed(futures):
+                for key, embedding, error in future.result():
+                    course, semester, img_name = key
+                    if embedding is None:
+                        failed += 1
+                        print(f"❌ {course}/{semester}/{img_name}: {error}")
+                        continue
+                    caches[(course, semester)].put(img_name, paths[key], embedding)
+                    encoded += 1
+                done = encoded + failed
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{len(tasks)} image(s), {done / elapsed:.1f} images/s")
+
+    for (course, semester), cache in caches.items():
+        cache.save()
+        publish_gallery(course, semester, cache, name)
+    seconds = time.perf_counter() - started
+
+    if encoded:
+        print(f"✔ Encoded {encoded} image(s) in {seconds:.1f}s ({encoded / seconds:.1f} images/s), "
+              f"{images - len(tasks)} already cached, {failed} failed")
+    else:
+        print(f"✔ Nothing to encode: {images - len(tasks)} image(s) already cached, {failed} failed")
+    return {"images": images, "cached": images - len(tasks), "encoded": encoded, "failed": failed, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("course", nargs="?")
+    parser.add_argument("semester", nargs="?")
+    parser.add_argument("--all", action="store_true", help="every Faces/<course>/<semester> folder")
+    parser.add_argument("--workers", type=int, default=None, help="encoding processes (default: min(4, CPUs))")
+    parser.add_argument("--batch", type=int, default=16, help="images per model call (default: 16)")
+    parser.add_argument("--backend", default=None, help="embedding backend (default: FACE_BACKEND or deepface)")
+    parser.add_argument("--int8", action="store_true", default=None, help="quantized onnx/tflite model")
+    parser.add_argument("--rebuild", action="store_true", help="ignore the cache and re-encode everything")
+    args = parser.parse_args()
+
+    if args.all == bool(args.course):
+        parser.error("give either COURSE SEMESTER or --all")
+    if args.course and not args.semester:
+        parser.error("SEMESTER is required with COURSE")
+
+    folders = class_folders() if args.all else class_folders(args.course, args.semester)
+    enroll(folders, args.backend, args.int8, args.workers, args.batch, args.rebuild)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import cv2
+import numpy as np
+
+
+def resize_face(face, target_size):
+    """
+    Letterbox a face crop to the model's (height, width), the same way
+    DeepFace.represent does: keep aspect ratio, pad with black, scale to [0, 1].
+    """
+    target_h, target_w = target_size
+    factor = min(target_h / face.shape[0], target_w / face.shape[1])
+    dsize = (max(1, int(face.shape[1] * factor)), max(1, int(face.shape[0] * factor)))
+    face = cv2.resize(face, dsize)
+
+    diff_h = target_h - face.shape[0]
+    diff_w = target_w - face.shape[1]
+    face = np.pad(
+        face,
+        ((diff_h // 2, diff_h - diff_h // 2), (diff_w // 2, diff_w - diff_w // 2), (0, 0)),
+        "constant",
+    )
+    if face.shape[:2] != (target_h, target_w):
+        face = cv2.resize(face, (target_w, target_h))
+
+    face = face.astype(np.float32)
+    if face.max() > 1:
+        face /= 255.0
+    return face
+
+
+def embed_faces(model, faces):
+    """Embed a list of face crops with one batched call to an embedder.py backend. Returns an (N, D) float32 array."""
+    if not faces:
+        return np.zeros((0, model.output_shape), dtype=np.float32)
+
+    batch = np.stack([resize_face(face, model.input_shape) for face in faces])
+    return np.asarray(model.predict_batch(batch), dtype=np.float32)
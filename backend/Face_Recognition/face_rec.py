@@ -1,162 +1,185 @@
-import cv2
 import os
-import csv
 import time
-import sys
-import numpy as np
-from deepface import DeepFace
-import requests
+import argparse
+
+STARTED = time.perf_counter()
 
 backend_url = os.getenv("BACKEND_URL")
 HEADLESS = os.environ.get("HEADLESS", "False") == "True"
 
 
-def main():
-    # --- PATHS ---
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    if len(sys.argv) < 3:
-        print("❌ Course & Semester not provided!")
-        return
-
-    course = sys.argv[1]
-    semester = sys.argv[2]
-    faces_dir = os.path.join(BASE_DIR, "Faces", course, semester)
-    if not os.path.exists(faces_dir):
-        os.makedirs(faces_dir)
-        print(f"Created folder: {faces_dir}. Please add student images here.")
-
-    attendance_file = os.path.join(BASE_DIR, "attendance.csv")
-
-    model_name = "Facenet"
-    threshold = 10
-
-    # --- SETUP ---
-    if not os.path.exists(faces_dir):
-        os.makedirs(faces_dir)
-        print(f"Created {faces_dir}. Please add clear face images (1 per person).")
-
-    if not os.path.exists(attendance_file):
-        with open(attendance_file, "w", newline="") as f:
-            writer = csv.writer(f)
-            writer.writerow(["Name", "Status"])
-
-    # --- HELPER ---
-    def mark_attendance(roll_no):
-        if not roll_no:
-            return
-
-        try:
-            # Get student by roll number
-            user_res = requests.get(f"{backend_url}/getstudent/rollnum/{roll_no}")
-            if user_res.status_code == 200:
-                student = user_res.json()
-                student_id = student["id"]
-                student_name = student["name"]
-
-                # CSV write (local backup)
-                with open(attendance_file, "r") as f:
-                    existing = f.read()
-                if student_name not in existing:
-                    with open(attendance_file, "a", newline="") as f:
-                        writer = csv.writer(f)
-                        writer.writerow([student_name, "Present"])
-
-                # Send attendance to server
-                response = requests.post(
-                    f"{backend_url}/attendance",
-                    json={"student_id": student_id, "class_id": 1, "status": "present"}
-                )
-                if response.status_code == 200:
-                    print(f"✔ Attendance synced to server for {student_name}")
-                else:
-                    print(f"❌ Failed server sync: {response.text}")
-            else:
-                print(f"❌ Student not found for roll number {roll_no}")
-
-        except Exception as e:
-            print(f"❌ Error sending attendance to server: {e}")
-
-
-    # --- EXTRACT ROLL NO FROM FILENAME ---
-    def extract_roll_number(filename):
-        start = filename.find("(")
-        end = filename.rfind(")")
-        if start != -1 and end != -1:
-            return filename[start+1:end]
-        return None
-
-    # --- LOAD MODEL ---
-    print("Loading DeepFace model...")
-    model = DeepFace.build_model(model_name)
-
-    # --- ENCODE KNOWN FACES ---
-    print("Encoding known faces...")
-    known_embeddings = {}
-    for img_name in os.listdir(faces_dir):
-        img_path = os.path.join(faces_dir, img_name)
-        try:
-            reps = DeepFace.represent(img_path=img_path, model_name=model_name, enforce_detection=False)
-            if len(reps) > 0:
-                embedding = reps[0]["embedding"]
-                person_name = os.path.splitext(img_name)[0]
-                known_embeddings[person_name] = embedding
-                print(f"Encoded: {person_name}")
-        except Exception as e:
-            print(f"Error encoding {img_name}: {e}")
-
-
-    print("All known faces encoded successfully.")
-
-    # --- START WEBCAM ---
-    cap = cv2.VideoCapture(0)
-    print("Press ESC to exit...")
+class StartupTimer:
+    """Wall time of each startup phase, printed as one line before recognition starts."""
+
+    def __init__(self, started):
+        self.started = started
+        self.last = started
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        parts = " | ".join(f"{name} {seconds:.2f}s" for name, seconds in self.phases)
+        print(f"Startup: {parts} | total {self.last - self.started:.2f}s")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mark attendance by face recognition.")
+    parser.add_argument("course")
+    parser.add_argument("semester")
+    parser.add_argument("--source", default="0",
+                        help="webcam index, video file or directory of images (default: webcam 0)")
+    parser.add_argument("--fast", action="store_true",
+                        help="process a video/image source as fast as possible, without display or pacing")
+    parser.add_argument("--stride", type=int, default=1,
+                        help="with --fast, recognize every Nth frame (default: 1)")
+    parser.add_argument("--no-tracking", action="store_true",
+                        help="treat every frame as a separate picture: no tracking, one match marks a student "
+                             "(default for image folders and --stride > 1)")
+    parser.add_argument("--log", help="write a per-frame recognition log (CSV) to this path")
+    parser.add_argument("--min-interval", type=float, default=0.5,
+                        help="fastest recognition cadence in seconds, used while there is motion (default: 0.5)")
+    parser.add_argument("--max-interval", type=float, default=10.0,
+                        help="heartbeat cadence in seconds for a static scene (default: 10)")
+    parser.add_argument("--motion-threshold", type=float, default=0.02,
+                        help="fraction of changed pixels treated as full motion (default: 0.02)")
+    return parser.parse_args()
 
-    last_recognition_time = 0
-    recognized_name = "Ready..."
 
+def main():
+    args = parse_args()
+    timer = StartupTimer(STARTED)
+
+    # --- IMPORTS (nothing heavy is imported before this) ---
+    if os.environ.get("FACE_BACKEND", "deepface").lower() == "deepface":
+        import deepface  # noqa: F401  (TensorFlow; timed here rather than inside the model build)
+    from recognizer import ANN_INDEX_PATH, BASE_DIR, RecognitionSession, load_gallery, load_model, warm_up
+    from sources import ImageDirectorySource, RecognitionLog, open_source
+    from scheduler import MotionScheduler
+    from roster import Roster
+    from attendance_sync import AttendanceSync, make_session
+    timer.mark("imports")
+
+    # --- BACKEND CLIENTS (one pooled session) ---
+    session = make_session()
+    roster = Roster(backend_url, args.course, args.semester, session=session, campus=bool(ANN_INDEX_PATH))
+    roster.refresh()
+    attendance_sync = AttendanceSync(
+        backend_url, os.path.join(BASE_DIR, "attendance_journal.sqlite3"), session=session
+    ).start()
+    timer.mark("roster")
+
+    # --- MODEL + GALLERY ---
+    model = load_model()
+    timer.mark("model build")
+    warm_up(model)
+    timer.mark("first inference")
+    gallery = load_gallery(args.course, args.semester, model)
+    timer.mark("gallery")
+
+    # --- OPEN INPUT ---
+    source = open_source(args.source, paced=not args.fast)
+    recognition_log = RecognitionLog(args.log) if args.log else None
+    timer.mark("source")
+
+    # --- RECOGNITION (runs on the pipeline's inference thread) ---
+    # Photos in a folder, or video frames far apart, can't be tracked or voted across
+    independent_frames = args.no_tracking or isinstance(source, ImageDirectorySource) or (args.fast and args.stride > 1)
+    recognition = RecognitionSession(args.course, args.semester, model, roster, attendance_sync, gallery,
+                                     recognition_log=recognition_log, source=source, verbose=not args.fast,
+                                     independent_frames=independent_frames)
+    timer.mark("session")
+    timer.report()
+    if not args.fast:
+        recognition.watch_gallery()
+
+    if args.fast:
+        run_offline(source, recognition.recognize, recognition.mark_attendance, args.stride)
+    else:
+        scheduler = MotionScheduler(args.min_interval, args.max_interval, args.motion_threshold)
+        run_live(source, recognition.recognize, recognition.mark_attendance, scheduler, attendance_sync)
+
+    recognition.close()
+    source.release()
+    remaining = attendance_sync.close()
+    if remaining:
+        print(f"⚠ {remaining} attendance mark(s) could not be sent; they stay journaled for the next run")
+    if recognition_log:
+        recognition_log.close()
+        print(f"Recognition log written to {args.log}")
+    recognition.print_summary()
+
+
+def run_offline(source, recognize, sync, stride=1):
+    """Recognize every stride-th frame of a file/directory source back to back, no display."""
+    started = time.perf_counter()
+    frames = 0
     while True:
-        ret, frame = cap.read()
+        ret, frame = source.read()
         if not ret:
             break
+        frames += 1
+        if source.frame_index % stride:
+            continue
 
-        current_time = time.time()
-        if (current_time - last_recognition_time) > 2:
-            try:
-                reps = DeepFace.represent(frame, model_name=model_name, enforce_detection=False)
-                if len(reps) > 0:
-                    embedding = np.array(reps[0]["embedding"])
-                    min_dist = float("inf")
-                    identity = "Unknown"
-
-                    for name, known_emb in known_embeddings.items():
-                        dist = np.linalg.norm(embedding - np.array(known_emb))
-                        if dist < min_dist:
-                            min_dist = dist
-                            identity = name
-
-                    if min_dist < threshold:
-                        recognized_name = f"{identity} (Present)"
-                        roll_no = extract_roll_number(identity)
-                        mark_attendance(roll_no)
-                    else:
-                        recognized_name = "Unknown"
-                else:
-                    recognized_name = "No face detected"
-
-                last_recognition_time = current_time
-
-            except Exception as e:
-                recognized_name = f"Error: {e}"
+        _, _, present = recognize(frame)
+        for roll_no in present:
+            sync(roll_no)
+
+    elapsed = time.perf_counter() - started
+    if elapsed > 0:
+        print(f"Read {frames} frame(s) in {elapsed:.1f}s ({frames / elapsed:.1f} fps end-to-end)")
+
+
+def run_live(source, recognize, sync, scheduler, attendance_sync):
+    """Threaded capture/inference/sync with an on-screen preview."""
+    import cv2
+    from pipeline import RateMeter, RecognitionPipeline
+    from recognizer import draw_overlay
+
+    print("Press ESC to exit...")
+    pipeline = RecognitionPipeline(source, recognize, sync, scheduler=scheduler).start()
+    display_meter = RateMeter()
+    shown_seq = 0
+    last_report = time.time()
+
+    while pipeline.running:
+        seq, frame = pipeline.latest_frame()
+        if frame is None or seq == shown_seq:
+            if cv2.waitKey(1) == 27:  # ESC key
+                break
+            continue
+        shown_seq = seq
 
         # Display frame
-        cv2.putText(frame, recognized_name, (20, 40),
-                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+        frame = frame.copy()
+        labels, recognized_name = pipeline.result()
+        stats = pipeline.stats()
+        draw_overlay(frame, labels, recognized_name,
+                     f"display {display_meter.rate:.0f} fps | infer {stats['inference_ms']:.0f} ms "
+                     f"every {stats['interval']:.1f}s ({stats['inferences_per_min']}/min) | "
+                     f"q frame={stats['frame_queue']} sync={stats['sync_queue']}")
         cv2.imshow("Attendance System", frame)
+        display_meter.tick()
+
+        if time.time() - last_report > 10:
+            print(f"Pipeline: display {display_meter.rate:.1f} fps, capture {stats['capture_fps']:.1f} fps, "
+                  f"inference {stats['inference_ms']:.0f} ms, queues frame={stats['frame_queue']} "
+                  f"sync={stats['sync_queue']}, dropped frames={stats['dropped_frames']} "
+                  f"syncs={stats['dropped_syncs']}, motion {stats['motion']:.3f}, "
+                  f"{stats['inferences_per_min']} inference(s)/min")
+            sync_stats = attendance_sync.stats()
+            print(f"Attendance sync: backlog {sync_stats['backlog']}, sent {sync_stats['sent']}, "
+                  f"latency {sync_stats['last_latency_ms']:.0f} ms (avg {sync_stats['avg_latency_ms']:.0f} ms)")
+            last_report = time.time()
 
         if cv2.waitKey(1) == 27:  # ESC key
             break
 
-    cap.release()
+    pipeline.stop()
     cv2.destroyAllWindows()
 
 
@@ -0,0 +1,199 @@
+import numpy as np
+
+METRICS = ("euclidean", "cosine")
+GALLERY_MODES = ("prototypes", "centroid")
+
+# DeepFace's verification thresholds for Facenet
+DEFAULT_THRESHOLDS = {"euclidean": 10.0, "cosine": 0.40}
+
+
+def reduce_prototypes(embeddings, max_prototypes=3, mode="prototypes"):
+    """
+    (k, D) embeddings of one student's photos -> at most max_prototypes rows.
+
+    "centroid" keeps their mean; "prototypes" keeps every photo while there
+    are few enough, otherwise k-means centres (one per pose/lighting cluster).
+    """
+    if mode not in GALLERY_MODES:
+        raise ValueError(f"Unknown gallery mode '{mode}', expected one of {GALLERY_MODES}")
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    if mode == "centroid" or max_prototypes <= 1:
+        return embeddings.mean(axis=0, keepdims=True)
+    if len(embeddings) <= max_prototypes:
+        return embeddings
+
+    from ann_index import kmeans
+
+    return kmeans(embeddings, max_prototypes)
+
+
+class Gallery:
+    """
+    Known-face embeddings held as one contiguous float32 matrix.
+
+    Each identity owns one or more rows (prototypes), stored next to each
+    other. Norms are computed once at build time so a lookup is a single
+    matrix product against every prototype, reduced to the closest
+    prototype per identity, for one query or a batch of them.
+    """
+
+    def __init__(self, names, embeddings, metric="euclidean", owners=None):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric '{metric}', expected one of {METRICS}")
+
+        self.names = list(names)
+        self.metric = metric
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.shape[0] == 0:
+            matrix = matrix.reshape(0, matrix.shape[-1] if matrix.ndim == 2 else 0)
+
+        # owners[i] = index into names of row i; default: one row per name
+        if owners is None:
+            owners = np.arange(matrix.shape[0])
+        owners = np.asarray(owners, dtype=np.int64)
+        if owners.shape[0] != matrix.shape[0]:
+            raise ValueError(f"{owners.shape[0]} owners for {matrix.shape[0]} embeddings")
+        counts = np.bincount(owners, minlength=len(self.names))
+        if len(counts) != len(self.names) or np.any(counts == 0):
+            raise ValueError(f"{len(self.names)} names for {matrix.shape[0]} embeddings owned by {len(counts)}")
+
+        if np.all(owners[1:] >= owners[:-1]):
+            # Already grouped by identity (e.g. a memory-mapped gallery file): use the rows in place
+            self.owners = owners
+            self.matrix = np.ascontiguousarray(matrix)
+        else:
+            order = np.argsort(owners, kind="stable")
+            self.owners = owners[order]
+            self.matrix = np.ascontiguousarray(matrix[order])
+        # First row of each identity, for the per-identity min over prototypes
+        self.starts = np.searchsorted(self.owners, np.arange(len(self.names)))
+        self.single = len(self.owners) == len(self.names)
+
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+        self.norms = np.sqrt(self.sq_norms)
+
+    @classmethod
+    def from_dict(cls, known_embeddings, metric="euclidean"):
+        """name -> one embedding (D,) or a set of prototypes (k, D)."""
+        names = list(known_embeddings)
+        rows = [np.atleast_2d(np.asarray(known_embeddings[n], dtype=np.float32)) for n in names]
+        if not rows:
+            return cls([], np.zeros((0, 0), dtype=np.float32), metric)
+        owners = np.repeat(np.arange(len(names)), [len(r) for r in rows])
+        return cls(names, np.concatenate(rows), metric, owners)
+
+    @property
+    def prototypes(self):
+        return self.matrix.shape[0]
+
+    @property
+    def row_names(self):
+        """Owner name of every row, e.g. to index each prototype separately."""
+        return [self.names[o] for o in self.owners]
+
+    def embeddings_of(self, name):
+        """(k, D) prototypes of one identity."""
+        i = self.names.index(name)
+        return self.matrix[self.owners == i]
+
+    def updated(self, upserts=None, removals=()):
+        """
+        New Gallery with identities added or replaced (name -> embedding or
+        (k, D) prototypes) and removed.
+
+        This one is left untouched, so matching can keep running against it
+        while the replacement is built; the caller swaps the reference.
+        """
+        upserts = upserts or {}
+        drop = set(removals) | set(upserts)
+        keep = [i for i, name in enumerate(self.names) if name not in drop]
+
+        # Renumber kept identities 0..len(keep)-1, new ones after them
+        remap = np.full(len(self.names), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        kept_rows = remap[self.owners] >= 0
+
+        names = [self.names[i] for i in keep] + list(upserts)
+        rows = [self.matrix[kept_rows]] if keep else []
+        owners = [remap[self.owners[kept_rows]]] if keep else []
+        for j, embedding in enumerate(upserts.values()):
+            rows.append(np.atleast_2d(np.asarray(embedding, dtype=np.float32)))
+            owners.append(np.full(len(rows[-1]), len(keep) + j, dtype=np.int64))
+        if not rows:
+            return Gallery([], np.zeros((0, 0), dtype=np.float32), self.metric)
+        return Gallery(names, np.concatenate(rows), self.metric, np.concatenate(owners))
+
+    def __len__(self):
+        return len(self.names)
+
+    def distances(self, queries):
+        """(Q, N) distance matrix between the query embeddings and each identity's closest prototype."""
+        dist = self.prototype_distances(queries)
+        if self.single or dist.shape[1] == 0:
+            return dist
+        return np.minimum.reduceat(dist, self.starts, axis=1)
+
+    def prototype_distances(self, queries):
+        """(Q, P) distance matrix between the query embeddings and every row."""
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        dots = q @ self.matrix.T
+
+        if self.metric == "euclidean":
+            q_sq = np.einsum("ij,ij->i", q, q)
+            d2 = q_sq[:, None] + self.sq_norms[None, :] - 2.0 * dots
+            np.maximum(d2, 0.0, out=d2)
+            return np.sqrt(d2, out=d2)
+
+        q_norms = np.linalg.norm(q, axis=1)
+        denom = q_norms[:, None] * self.norms[None, :]
+        np.maximum(denom, 1e-12, out=denom)
+        return 1.0 - dots / denom
+
+    def search(self, queries, k=1):
+        """
+        Top-k gallery entries for each query.
+
+        Returns (indices, distances), both shaped (Q, k) and sorted by
+        increasing distance. k is clipped to the gallery size.
+        """
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        k = min(k, len(self))
+        if k == 0:
+            empty = np.zeros((q.shape[0], 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+
+        dist = self.distances(q)
+        if k < dist.shape[1]:
+            idx = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(dist.shape[1]), dist.shape).copy()
+
+        part = np.take_along_axis(dist, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
+
+    def top_k(self, embedding, k=5):
+        """[(name, distance), ...] for a single query."""
+        idx, dist = self.search(embedding, k)
+        return [(self.names[i], float(d)) for i, d in zip(idx[0], dist[0])]
+
+    def match(self, queries, threshold):
+        """
+        Best match for every query as a list of (name, distance).
+
+        name is None when the gallery is empty or the closest entry is not
+        within threshold.
+        """
+        idx, dist = self.search(queries, 1)
+        results = []
+        for row_idx, row_dist in zip(idx, dist):
+            if len(row_idx) == 0:
+                results.append((None, float("inf")))
+                continue
+            d = float(row_dist[0])
+            results.append((self.names[row_idx[0]] if d < threshold else None, d))
+        return results
+
+    def best_match(self, embedding, threshold=float("inf")):
+        return self.match(embedding, threshold)[0]
@@ -0,0 +1,148 @@
+"""
+Gallery files that many processes map instead of each building a copy.
+
+Layout (little-endian):
+
+    8 bytes   magic b"FTGALRY1"
+    4 bytes   header length (uint32)
+    header    JSON: version, model, metric, dim, rows, names, source
+    padding   to a 64-byte boundary
+    rows*dim  float32 embedding matrix, rows grouped by identity
+    rows      int32 owner of each row (index into names)
+
+Readers np.memmap the matrix read-only, so every process serving the same
+class shares one copy of its pages through the OS page cache instead of
+holding a private one. A new version is written next to the file and
+os.replace()d over it: readers either see the old file or the complete new
+one, and processes still mapping the old version keep valid pages until
+they remap. (On Windows a file that is mapped can't be replaced; there the
+swap fails until readers have moved on.)
+"""
+import hashlib
+import json
+import os
+import struct
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from gallery import Gallery
+
+MAGIC = b"FTGALRY1"
+ALIGN = 64
+
+
+def gallery_path_for(base_dir, course, semester, model_name):
+    from embedding_cache import check_class
+
+    check_class(course, semester)
+    return os.path.join(base_dir, "embeddings", course, semester, f"{model_name}.gallery")
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on path (created if missing), held across processes until the block exits."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # retries for ~10 s, then raises
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def folder_source(faces_dir):
+    """Digest of a Faces folder's image names, mtimes and sizes: what a gallery file was built from."""
+    from embedding_cache import EmbeddingCache, list_gallery_images
+
+    # A new embedding cache version means the embeddings changed even if the photos didn't
+    h = hashlib.sha1(f"cache v{EmbeddingCache.VERSION}\n".encode())
+    if os.path.isdir(faces_dir):
+        for name in list_gallery_images(faces_dir):
+            try:
+                st = os.stat(os.path.join(faces_dir, name))
+            except FileNotFoundError:
+                continue
+            h.update(f"{name}\0{st.st_mtime_ns}\0{st.st_size}\n".encode())
+    return h.hexdigest()
+
+
+def read_header(path):
+    """(header dict, data offset), or (None, 0) if the file is missing or isn't a gallery file."""
+    try:
+        with open(path, "rb") as f:
+            magic, length = struct.unpack("<8sI", f.read(12))
+            if magic != MAGIC:
+                return None, 0
+            header = json.loads(f.read(length).decode("utf-8"))
+    except (OSError, struct.error, ValueError):
+        return None, 0
+    offset = 12 + length
+    return header, offset + (-offset % ALIGN)
+
+
+def save_gallery(path, gallery, model_name, source=None):
+    """Atomically publish gallery at path as the next version. Returns the version written."""
+    previous, _ = read_header(path)
+    version = previous["version"] + 1 if previous else 1
+
+    matrix = np.ascontiguousarray(gallery.matrix, dtype="<f4")
+    header = {
+        "version": version,
+        "model": model_name,
+        "metric": gallery.metric,
+        "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        "rows": int(matrix.shape[0]),
+        "names": gallery.names,
+        "source": source,
+        "created": time.time(),
+    }
+    encoded = json.dumps(header).encode("utf-8")
+    offset = 12 + len(encoded)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(struct.pack("<8sI", MAGIC, len(encoded)))
+        f.write(encoded)
+        f.write(b"\0" * (-offset % ALIGN))
+        f.write(matrix.tobytes())
+        f.write(np.asarray(gallery.owners, dtype="<i4").tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return version
+
+
+def open_gallery(path):
+    """(Gallery over a read-only memory map of the file, header). Raises ValueError if it isn't a gallery file."""
+    header, offset = read_header(path)
+    if header is None:
+        raise ValueError(f"{path} is not a gallery file")
+
+    rows, dim = header["rows"], header["dim"]
+    if rows == 0:
+        return Gallery([], np.zeros((0, dim), dtype=np.float32), header["metric"]), header
+
+    matrix = np.memmap(path, dtype="<f4", mode="r", offset=offset, shape=(rows, dim))
+    owners = np.fromfile(path, dtype="<i4", count=rows, offset=offset + rows * dim * 4)
+    return Gallery(header["names"], matrix, header["metric"], owners), header
@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+
+from embedding_cache import list_gallery_images
+
+
+class GalleryWatcher:
+    """
+    Keeps a live gallery in step with its Faces/<course>/<semester> folder.
+
+    A background thread stats the folder every `interval` seconds (plain
+    polling: no extra dependency, works on network shares). A change is
+    applied once the folder has looked the same for one more poll, so a
+    photo that is still being copied isn't encoded half-written. Only added
+    or modified images are encoded (through the embedding cache, which is
+    saved so a restart doesn't redo them); apply(images, changed) then
+    receives {stem: embedding} for every photo in the folder and the set of
+    stems that were added, modified or removed.
+    """
+
+    def __init__(self, faces_dir, cache, encode, apply, interval=2.0, label=None):
+        self.faces_dir = faces_dir
+        self.cache = cache
+        self.encode = encode
+        self.apply = apply
+        self.interval = interval
+        self.label = label or faces_dir
+
+        # What the live gallery was built from
+        self.snapshot = {name: (e["mtime_ns"], e["size"]) for name, e in cache.entries.items()}
+        self.pending = None
+
+        self.reloads = 0
+        self.last_reload_ms = 0.0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"gallery-watch-{self.label}", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        self.stop_event.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def scan(self):
+        """{image name: (mtime_ns, size)} for the folder right now."""
+        snapshot = {}
+        if not os.path.isdir(self.faces_dir):
+            return snapshot
+        for name in list_gallery_images(self.faces_dir):
+            try:
+                st = os.stat(os.path.join(self.faces_dir, name))
+            except FileNotFoundError:
+                continue
+            snapshot[name] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def poll(self):
+        """Apply what changed since the last applied scan. Returns True if the gallery was updated."""
+        snapshot = self.scan()
+        if snapshot == self.snapshot:
+            self.pending = None
+            return False
+        if snapshot != self.pending:
+            # Still changing (or first sight of the change): wait for it to settle
+            self.pending = snapshot
+            return False
+        self.pending = None
+
+        started = time.perf_counter()
+        added = [n for n in snapshot if n not in self.snapshot]
+        modified = [n for n in snapshot if n in self.snapshot and snapshot[n] != self.snapshot[n]]
+        removed = [n for n in self.snapshot if n not in snapshot]
+
+        changed = {os.path.splitext(name)[0] for name in removed}
+        failed = 0
+        for name in added + modified:
+            img_path = os.path.join(self.faces_dir, name)
+            embedding = self.cache.get(name, img_path)
+            if embedding is not None and name in modified:
+                continue  # touched, same contents
+            if embedding is None:
+                try:
+                    embedding = self.encode(img_path)
+                except Exception as e:
+                    print(f"❌ Error encoding {name}: {e}")
+                    embedding = None
+                if embedding is None:
+                    failed += 1
+                    continue
+                self.cache.put(name, img_path, embedding)
+            changed.add(os.path.splitext(name)[0])
+        encoded = time.perf_counter()
+
+        self.cache.prune(snapshot)
+        if changed:
+            images = {os.path.splitext(name)[0]: entry["embedding"] for name, entry in self.cache.entries.items()}
+            self.apply(images, changed)
+        swapped = time.perf_counter()
+        self.snapshot = snapshot
+        self.cache.save()
+
+        self.reloads += 1
+        self.last_reload_ms = (swapped - started) * 1000
+        print(f"↻ Gallery {self.label}: +{len(added)} added, ~{len(modified)} modified, -{len(removed)} removed, "
+              f"{failed} failed in {self.last_reload_ms:.0f} ms "
+              f"(encode {(encoded - started) * 1000:.0f} ms, swap {(swapped - encoded) * 1000:.1f} ms)")
+        return True
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"❌ Gallery watch {self.label}: {e}")
@@ -0,0 +1,205 @@
+import queue
+import threading
+import time
+from collections import deque
+
+
+def put_latest(q, item):
+    """Put into a bounded queue, discarding the oldest entries when full. Returns how many were dropped."""
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class RateMeter:
+    """Exponentially smoothed events-per-second counter."""
+
+    def __init__(self, smoothing=0.9):
+        self.smoothing = smoothing
+        self.rate = 0.0
+        self.last = None
+
+    def tick(self):
+        now = time.perf_counter()
+        if self.last is not None and now > self.last:
+            instant = 1.0 / (now - self.last)
+            self.rate = instant if self.rate == 0 else self.smoothing * self.rate + (1 - self.smoothing) * instant
+        self.last = now
+
+
+class RecognitionPipeline:
+    """
+    Capture -> inference -> attendance sync, each on its own thread.
+
+    - capture thread: reads the camera as fast as it delivers and keeps only
+      the newest frame, both for display and in a 1-slot inference queue,
+      so stale frames are dropped instead of piling up.
+    - inference thread: every `interval` seconds takes the newest frame and
+      calls recognize(frame) -> (labels, status, identities). With a
+      scheduler (see scheduler.MotionScheduler) the capture thread feeds it
+      every frame and the scheduler decides when the next run is due.
+    - sync thread: drains a bounded queue of identities through sync(identity),
+      so slow HTTP calls never block recognition or the preview.
+
+    The display loop stays on the caller's thread (cv2.imshow needs it) and
+    reads latest_frame()/result() without waiting on either worker.
+    """
+
+    def __init__(self, source, recognize, sync, interval=2.0, sync_queue_size=256, scheduler=None):
+        self.source = source
+        self.recognize = recognize
+        self.sync = sync
+        self.interval = interval
+        self.scheduler = scheduler
+
+        self.frames = queue.Queue(maxsize=1)
+        self.sync_queue = queue.Queue(maxsize=sync_queue_size)
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+        self.frame = None
+        self.frame_seq = 0
+        self.labels = []
+        self.status = "Ready..."
+
+        self.capture_meter = RateMeter()
+        self.inference_meter = RateMeter()
+        self.inference_ms = 0.0
+        self.latencies = deque(maxlen=120)
+        self.inferences = 0
+        self.dropped_frames = 0
+        self.dropped_syncs = 0
+        self.synced = 0
+
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+            threading.Thread(target=self._sync_loop, name="sync", daemon=True),
+        ]
+
+    @property
+    def running(self):
+        return not self.stop_event.is_set()
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Stop capture and inference, then let the sync thread flush what is queued."""
+        self.stop_event.set()
+        for t in self.threads:
+            t.join(timeout)
+
+    def latest_frame(self):
+        """(sequence number, newest frame); the frame is shared, copy it before drawing."""
+        with self.lock:
+            return self.frame_seq, self.frame
+
+    def result(self):
+        with self.lock:
+            return self.labels, self.status
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        stats = {
+            "capture_fps": self.capture_meter.rate,
+            "inference_fps": self.inference_meter.rate,
+            "inference_ms": self.inference_ms,
+            "inference_p50_ms": latencies[len(latencies) // 2] if latencies else 0.0,
+            "inference_p95_ms": latencies[int(len(latencies) * 0.95)] if latencies else 0.0,
+            "inferences": self.inferences,
+            "frame_queue": self.frames.qsize(),
+            "sync_queue": self.sync_queue.qsize(),
+            "dropped_frames": self.dropped_frames,
+            "dropped_syncs": self.dropped_syncs,
+            "synced": self.synced,
+        }
+        if self.scheduler is not None:
+            stats.update(self.scheduler.stats())
+        return stats
+
+    # --- THREADS ---
+    def _capture_loop(self):
+        while self.running:
+            ret, frame = self.source.read()
+            if not ret:
+                self.stop_event.set()
+                break
+
+            with self.lock:
+                self.frame = frame
+                self.frame_seq += 1
+            self.dropped_frames += put_latest(self.frames, frame)
+            self.capture_meter.tick()
+
+            if self.scheduler is not None:
+                self.scheduler.observe(frame)
+
+    def _inference_loop(self):
+        last_run = None
+        while self.running:
+            if last_run is not None:
+                since_last = time.monotonic() - last_run
+                if self.scheduler is not None:
+                    # Poll so a burst of motion cuts a long heartbeat wait short
+                    if not self.scheduler.due(since_last):
+                        self.stop_event.wait(0.05)
+                        continue
+                elif since_last < self.interval:
+                    self.stop_event.wait(self.interval - since_last)
+                    continue
+
+            try:
+                frame = self.frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            started = time.monotonic()
+            try:
+                labels, status, identities = self.recognize(frame)
+            except Exception as e:
+                labels, status, identities = [], f"Error: {e}", []
+            self.inference_ms = (time.monotonic() - started) * 1000
+            self.latencies.append(self.inference_ms)
+            self.inference_meter.tick()
+            self.inferences += 1
+            if self.scheduler is not None:
+                self.scheduler.record_inference()
+
+            with self.lock:
+                self.labels = labels
+                self.status = status
+
+            for identity in identities:
+                try:
+                    self.sync_queue.put_nowait(identity)
+                except queue.Full:
+                    self.dropped_syncs += 1
+
+            last_run = started
+
+    def _sync_loop(self):
+        while True:
+            try:
+                identity = self.sync_queue.get(timeout=0.1)
+            except queue.Empty:
+                # Exit only once inference can no longer enqueue anything
+                if not self.running and not self.threads[1].is_alive():
+                    break
+                continue
+
+            try:
+                self.sync(identity)
+                self.synced += 1
+            except Exception as e:
+                print(f"❌ Attendance sync failed for {identity}: {e}")
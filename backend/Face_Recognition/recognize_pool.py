@@ -0,0 +1,328 @@
+"""
+Recognition of uploaded frames (POST /recognize in app.py) in a process pool.
+
+Each pool process loads the embedding backend once and warms it up.
+Galleries are shared between the processes as memory-mapped files (see
+gallery_store.py), rebuilt when a class's Faces folder changes.
+A request is a list of JPEG byte strings; the process decodes them in
+place (np.frombuffer over the bytes, no intermediate copies), detects and
+quality-gates the faces of every frame, embeds all of them in one batched
+call and matches them against the gallery. Enrollment photos uploaded to
+the API are embedded by the same warm processes (embed_photos).
+
+The number of requests queued or running is bounded: submit() raises
+PoolBusy instead of queueing without limit, which the API turns into 429.
+"""
+import collections
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# How often a process checks a class's Faces folder for changes
+GALLERY_POLL = float(os.environ.get("FACE_GALLERY_POLL", 2.0))
+# How long a gallery downloaded from the database (FACE_GALLERY_SOURCE=db) is used
+DB_GALLERY_TTL = float(os.environ.get("FACE_DB_GALLERY_TTL", 60.0))
+
+
+class PoolBusy(Exception):
+    """Every slot of the recognition pool is taken."""
+
+
+class UnknownClass(Exception):
+    """No Faces/<course>/<semester> folder."""
+
+
+class InvalidClass(ValueError):
+    """course / semester isn't a plain folder name (e.g. "..")."""
+
+
+# --- POOL PROCESS STATE (one warm model per process) ---
+_model = None
+_detector = None
+_quality = None
+_galleries = {}  # (course, semester) -> (checked_at, gallery, threshold, mapped file version)
+_ann_index = None  # (mtime_ns, IVFIndex) of FACE_ANN_INDEX, shared by every class
+
+
+def _init_worker(kind, int8, threads):
+    global _model, _detector, _quality
+    from embedder import limit_threads, load_backend
+
+    limit_threads(threads)
+    from detector import FaceDetector
+    from quality import FaceQuality
+    from recognizer import QUALITY_GATE, warm_up
+
+    _model = load_backend(kind, int8, threads=threads)
+    warm_up(_model)
+    _detector = FaceDetector(work_width=int(os.environ.get("FACE_DETECT_WIDTH", 480)))
+    _quality = FaceQuality() if QUALITY_GATE else None
+    print(f"✔ Recognition pool process {os.getpid()} ready ({_model.name})")
+
+
+def _ready():
+    return os.getpid()
+
+
+def _campus_index(path):
+    """The campus IVF index (FACE_ANN_INDEX): one copy per process, reloaded only when the file changes."""
+    global _ann_index
+    from recognizer import load_ann_index
+
+    mtime = os.stat(path).st_mtime_ns
+    if _ann_index is None or _ann_index[0] != mtime:
+        _ann_index = (mtime, load_ann_index())
+    return _ann_index[1]
+
+
+def _gallery(course, semester):
+    """
+    (gallery, threshold) for a class, shared with the other pool processes.
+
+    The first process to find the class's gallery file missing or built
+    from an older state of its source (Faces folder, or a database download
+    older than FACE_DB_GALLERY_TTL) takes the file's lock, rebuilds it and
+    publishes a new version; the others block on the lock, then find the
+    file current. Every process maps that file rather than holding its own
+    copy. With a campus index (FACE_ANN_INDEX) there is no per-class
+    gallery: every class gets the index, reloaded when its file changes.
+    """
+    from gallery import DEFAULT_THRESHOLDS
+    from gallery_store import file_lock, folder_source, gallery_path_for, open_gallery, read_header, save_gallery
+    from recognizer import ANN_INDEX_PATH, GALLERY_SOURCE, faces_dir_for, load_gallery
+
+    key = (course, semester)
+    now = time.monotonic()
+    cached = _galleries.get(key)
+    if cached is not None and now - cached[0] < GALLERY_POLL:
+        return cached[1], cached[2]
+
+    if ANN_INDEX_PATH:
+        index = _campus_index(ANN_INDEX_PATH)
+        threshold = float(os.environ.get("FACE_THRESHOLD", DEFAULT_THRESHOLDS[index.metric]))
+        _galleries[key] = (now, index, threshold, None)
+        return index, threshold
+
+    if GALLERY_SOURCE == "db":
+        source = f"db:{int(time.time() // DB_GALLERY_TTL)}"
+    else:
+        source = folder_source(faces_dir_for(course, semester))
+    path = gallery_path_for(BASE_DIR, course, semester, _model.name)
+    header, _ = read_header(path)
+
+    if header is None or header["source"] != source:
+        # One process rebuilds; the others wait here and then map what it published
+        with file_lock(path + ".lock"):
+            header, _ = read_header(path)
+            if header is None or header["source"] != source:
+                gallery = load_gallery(course, semester, _model)
+                version = save_gallery(path, gallery, _model.name, source)
+                print(f"✔ Published gallery {course} / {semester} v{version} ({gallery.prototypes} row(s)) to {path}")
+                header, _ = read_header(path)
+
+    if cached is not None and cached[3] == header["version"]:
+        gallery = cached[1]
+    else:
+        gallery, header = open_gallery(path)
+    threshold = float(os.environ.get("FACE_THRESHOLD", DEFAULT_THRESHOLDS[gallery.metric]))
+    _galleries[key] = (now, gallery, threshold, header["version"])
+    return gallery, threshold
+
+
+def _recognize(course, semester, frames):
+    """Runs in a pool process: [jpeg bytes] -> {"frames": [[face, ...] per frame], "timings": {...}}."""
+    import cv2
+
+    from face_batch import embed_faces
+    from recognizer import extract_roll_number
+
+    started = time.perf_counter()
+    gallery, threshold = _gallery(course, semester)
+    loaded = time.perf_counter()
+
+    results = []
+    faces, slots = [], []
+    decode_s = 0.0
+    for index, data in enumerate(frames):
+        t = time.perf_counter()
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        decode_s += time.perf_counter() - t
+        if frame is None:
+            results.append({"error": "not a decodable image", "faces": []})
+            continue
+
+        entries = []
+        for box in _detector.detect(frame):
+            entry = {"box": [int(v) for v in box], "name": None, "roll_number": None, "distance": None}
+            face = _detector.raw_crop(frame, box)
+            eyes = _detector.find_eyes(face) if face.size else []
+            if _quality is not None:
+                score, reason = _quality.assess(face, eyes)
+                entry["quality"] = round(score, 3)
+                if reason is not None:
+                    entry["rejected"] = reason
+                    entries.append(entry)
+                    continue
+            faces.append(_detector.align_eyes(face, eyes) if _detector.align else face)
+            slots.append(entry)
+            entries.append(entry)
+        results.append({"faces": entries})
+    detected = time.perf_counter()
+
+    embeddings = embed_faces(_model, faces)
+    embedded = time.perf_counter()
+    for entry, (name, distance) in zip(slots, gallery.match(embeddings, threshold) if faces else []):
+        entry["name"] = name
+        entry["roll_number"] = extract_roll_number(name) if name else None
+        entry["distance"] = round(distance, 4)
+    matched = time.perf_counter()
+
+    return {
+        "frames": results,
+        "faces": sum(len(r["faces"]) for r in results),
+        "embedded": len(faces),
+        "pid": os.getpid(),
+        "timings": {
+            "gallery_ms": (loaded - started) * 1000,
+            "decode_ms": decode_s * 1000,
+            "detect_ms": (detected - loaded - decode_s) * 1000,
+            "embed_ms": (embedded - detected) * 1000,
+            "match_ms": (matched - embedded) * 1000,
+        },
+    }
+
+
+def _embed_photos(photos):
+    """Runs in a pool process: [image bytes] -> {"embeddings": [(D,) float32 or None per photo], "model": name}."""
+    import cv2
+
+    from embedder import largest_face
+    from face_batch import embed_faces
+
+    faces, index = [], []
+    for i, data in enumerate(photos):
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        # Same crop as embedder.enrollment_face, but uploaded photos must show a face
+        face = largest_face(image, _detector) if image is not None else None
+        if face is None:
+            continue
+        faces.append(face)
+        index.append(i)
+
+    embeddings = [None] * len(photos)
+    for i, embedding in zip(index, embed_faces(_model, faces)):
+        embeddings[i] = embedding
+    return {"embeddings": embeddings, "model": _model.name, "faces": len(faces)}
+
+
+# --- POOL ---
+class RecognitionPool:
+    """
+    Bounded pool of warm recognition processes.
+
+    At most max_pending requests are queued or running at once; submit()
+    raises PoolBusy past that rather than letting latency grow without
+    bound. Processes are spawned (not forked, TensorFlow isn't fork-safe)
+    and warmed up in the background by start().
+    """
+
+    def __init__(self, workers=None, max_pending=None, kind=None, int8=None, latency_window=500):
+        self.workers = workers or int(os.environ.get("RECOGNITION_POOL_WORKERS", min(2, os.cpu_count() or 1)))
+        self.max_pending = max_pending or int(os.environ.get("RECOGNITION_POOL_QUEUE", 2 * self.workers))
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(kind, int8, threads),
+        )
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.lock = threading.Lock()
+
+        self.pending = 0
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.frames = 0
+        self.faces = 0
+        self.latencies = collections.deque(maxlen=latency_window)
+
+    def start(self):
+        """Spawn and warm every process now instead of on the first requests."""
+        for _ in range(self.workers):
+            self.executor.submit(_ready)
+        return self
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, course, semester, frames):
+        """Future of _recognize's result. Raises InvalidClass, UnknownClass or PoolBusy."""
+        from embedding_cache import check_class
+
+        try:
+            check_class(course, semester)
+        except ValueError as e:
+            raise InvalidClass(str(e)) from e
+        db_source = os.environ.get("FACE_GALLERY_SOURCE", "files") == "db"
+        if not db_source and not os.path.isdir(os.path.join(BASE_DIR, "Faces", course, semester)):
+            raise UnknownClass(f"No Faces folder for {course} / {semester}")
+        return self._submit(_recognize, len(frames), course, semester, list(frames))
+
+    def embed_photos(self, photos):
+        """Future of {"embeddings": [(D,) or None per photo], "model": name}; None where no face was found. Raises PoolBusy."""
+        return self._submit(_embed_photos, len(photos), list(photos))
+
+    def _submit(self, fn, frames, *args):
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.rejected += 1
+            raise PoolBusy(f"{self.max_pending} recognition request(s) already pending")
+
+        submitted = time.perf_counter()
+        with self.lock:
+            self.pending += 1
+        try:
+            future = self.executor.submit(fn, *args)
+        except Exception:
+            self.slots.release()
+            with self.lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(lambda f: self._done(f, submitted, frames))
+        return future
+
+    def _done(self, future, submitted, frames):
+        self.slots.release()
+        elapsed_ms = (time.perf_counter() - submitted) * 1000
+        with self.lock:
+            self.pending -= 1
+            self.requests += 1
+            self.frames += frames
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            self.faces += future.result()["faces"]
+            self.latencies.append(elapsed_ms)
+
+    def stats(self):
+        with self.lock:
+            latencies = np.array(self.latencies) if self.latencies else np.zeros(1)
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "requests": self.requests,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "frames": self.frames,
+                "faces": self.faces,
+                "latency_p50_ms": float(np.percentile(latencies, 50)),
+                "latency_p95_ms": float(np.percentile(latencies, 95)),
+                "latency_max_ms": float(latencies.max()),
+            }
@@ -0,0 +1,464 @@
+import csv
+import os
+import time
+from functools import partial
+
+import cv2
+import numpy as np
+
+from embedder import enrollment_face
+from embedding_cache import EmbeddingCache, cache_path_for, check_class, list_gallery_images
+from gallery import DEFAULT_THRESHOLDS, Gallery, reduce_prototypes
+from gallery_watch import GalleryWatcher
+from ann_index import IVFIndex
+from face_batch import embed_faces
+from detector import FaceDetector
+from quality import FaceQuality
+from tracker import FaceTracker
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Campus-wide IVF index (see ann_index.py); when set it replaces the class gallery
+ANN_INDEX_PATH = os.environ.get("FACE_ANN_INDEX")
+# Photos sharing a roll number become one identity with up to this many
+# prototypes ("prototypes"), or a single averaged embedding ("centroid")
+GALLERY_MODE = os.environ.get("FACE_GALLERY_MODE", "prototypes")
+MAX_PROTOTYPES = int(os.environ.get("FACE_MAX_PROTOTYPES", 3))
+# "files": encode Faces/<course>/<semester>; "db": download the embeddings
+# enrolled through the API (GET /face-embeddings/export on BACKEND_URL)
+GALLERY_SOURCE = os.environ.get("FACE_GALLERY_SOURCE", "files")
+# Blur/size/pose gate in front of the embedding model (see quality.py).
+# Shadow mode also embeds the rejected crops, without letting them vote,
+# to measure how often they would have matched.
+QUALITY_GATE = os.environ.get("FACE_QUALITY_GATE", "True") == "True"
+QUALITY_SHADOW = os.environ.get("FACE_QUALITY_SHADOW", "False") == "True"
+# Confirmed tracks collect crops this many updates ahead of a refresh, so the refresh uses the best one
+QUALITY_WINDOW = int(os.environ.get("FACE_QUALITY_WINDOW", 5))
+
+
+# --- EXTRACT ROLL NO FROM FILENAME ---
+def extract_roll_number(filename):
+    start = filename.find("(")
+    end = filename.rfind(")")
+    if start != -1 and end != -1:
+        return filename[start+1:end]
+    return None
+
+
+def student_key(stem):
+    """Grouping key for a photo: its roll number, or the whole stem if it has none."""
+    return extract_roll_number(stem) or stem
+
+
+def identity_for(stem):
+    """'Annsh(22001008008) side' -> 'Annsh(22001008008)': the label shared by all of a student's photos."""
+    end = stem.rfind(")")
+    return stem[:end + 1] if stem.find("(") != -1 and end != -1 else stem
+
+
+def student_prototypes(image_embeddings, mode=None, max_prototypes=None):
+    """{photo stem: embedding} -> {identity: (k, D) prototypes}, one identity per roll number."""
+    mode = mode or GALLERY_MODE
+    max_prototypes = max_prototypes or MAX_PROTOTYPES
+    groups = {}
+    identities = {}
+    for stem in sorted(image_embeddings):
+        identity = identities.setdefault(student_key(stem), identity_for(stem))
+        groups.setdefault(identity, []).append(image_embeddings[stem])
+    return {identity: reduce_prototypes(np.stack(embs), max_prototypes, mode) for identity, embs in groups.items()}
+
+
+# --- LOAD MODEL ---
+# Backends import their runtime (deepface pulls in TensorFlow, seconds of
+# import time) only when they are built.
+def load_model(kind=None):
+    """Embedding backend from FACE_BACKEND (see embedder.py)."""
+    from embedder import load_backend
+
+    print(f"Loading {kind or os.environ.get('FACE_BACKEND', 'deepface')} embedding backend...")
+    model = load_backend(kind)
+    print(f"Embedding backend: {model.name} ({model.input_shape[0]}x{model.input_shape[1]} -> {model.output_shape})")
+    return model
+
+
+def warm_up(model):
+    """One dummy inference, so graph tracing and buffer allocation happen before the camera opens."""
+    h, w = model.input_shape
+    embed_faces(model, [np.zeros((h, w, 3), dtype=np.uint8)])
+
+
+# --- ENCODE KNOWN FACES ---
+def faces_dir_for(course, semester):
+    check_class(course, semester)
+    return os.path.join(BASE_DIR, "Faces", course, semester)
+
+
+def load_gallery(course, semester, model, metric=None):
+    """
+    Gallery for Faces/<course>/<semester>, re-encoding only images the
+    embedding cache doesn't cover. With FACE_ANN_INDEX set the campus index
+    is returned instead and the class folder isn't encoded.
+    """
+    if ANN_INDEX_PATH:
+        return load_ann_index()
+    metric = metric or os.environ.get("FACE_METRIC", "euclidean")
+    if GALLERY_SOURCE == "db":
+        return fetch_gallery(os.getenv("BACKEND_URL"), course, semester, model.name, metric)
+
+    faces_dir = faces_dir_for(course, semester)
+    if not os.path.exists(faces_dir):
+        os.makedirs(faces_dir)
+        print(f"Created folder: {faces_dir}. Please add student images here.")
+
+    print("Encoding known faces...")
+    # Caches are per backend name, so embeddings from different runtimes never mix
+    cache = EmbeddingCache(cache_path_for(BASE_DIR, course, semester, model.name), model.name).load()
+    image_names = list_gallery_images(faces_dir)
+    removed = cache.prune(image_names)
+
+    known_embeddings = {}
+    for img_name in image_names:
+        img_path = os.path.join(faces_dir, img_name)
+        person_name = os.path.splitext(img_name)[0]
+
+        embedding = cache.get(img_name, img_path)
+        if embedding is not None:
+            known_embeddings[person_name] = embedding
+            continue
+
+        try:
+            embedding = model.represent(img_path)
+            if embedding is not None:
+                known_embeddings[person_name] = embedding
+                cache.put(img_name, img_path, embedding)
+                print(f"Encoded: {person_name}")
+        except Exception as e:
+            print(f"Error encoding {img_name}: {e}")
+
+    cache.save()
+    print(f"Embedding cache: {cache.hits} hit(s), {cache.misses} miss(es), {len(removed)} removed")
+    if cache.misses >= 20:
+        print("Tip: prebuild galleries before class with `python enroll.py --all` (parallel, batched)")
+
+    gallery = Gallery.from_dict(student_prototypes(known_embeddings), metric=metric)
+    print(f"All known faces encoded successfully ({len(gallery)} student(s), "
+          f"{gallery.prototypes} prototype(s) from {len(known_embeddings)} photo(s)).")
+    return gallery
+
+
+def load_ann_index():
+    """The campus IVF index at FACE_ANN_INDEX, searched with FACE_ANN_NPROBE cells if set."""
+    nprobe = os.environ.get("FACE_ANN_NPROBE")
+    index = IVFIndex.load(ANN_INDEX_PATH, nprobe=int(nprobe) if nprobe else None)
+    print(f"Using campus index: {len(index)} faces, {index.nlist} cells, nprobe={index.nprobe}")
+    return index
+
+
+def fetch_gallery(backend_url, course, semester, model_name, metric="euclidean"):
+    """Gallery of a class's enrolled embeddings from the backend: no photos to copy, nothing to encode."""
+    import io
+
+    import requests
+
+    started = time.perf_counter()
+    res = requests.get(f"{backend_url}/face-embeddings/export",
+                       params={"course": course, "semester": semester, "model": model_name}, timeout=30)
+    res.raise_for_status()
+    # Two .npy arrays back to back: (N, D) float32 embeddings, then N labels
+    stream = io.BytesIO(res.content)
+    embeddings = np.load(stream, allow_pickle=False)
+    labels = np.load(stream, allow_pickle=False)
+
+    groups = {}
+    for label, embedding in zip(labels.tolist(), embeddings):
+        groups.setdefault(label, []).append(embedding)
+    gallery = Gallery.from_dict({label: reduce_prototypes(np.stack(rows), MAX_PROTOTYPES, GALLERY_MODE)
+                                 for label, rows in groups.items()}, metric=metric)
+    print(f"Gallery downloaded: {len(gallery)} student(s), {gallery.prototypes} prototype(s) from "
+          f"{len(embeddings)} embedding(s) ({len(res.content) / 1024:.0f} KB, "
+          f"{(time.perf_counter() - started) * 1000:.0f} ms)")
+    return gallery
+
+
+class RecognitionSession:
+    """
+    Recognition state for one course/semester: gallery, detector, tracker
+    and the attendance bookkeeping. The model, roster and attendance sync
+    are passed in so a long-lived worker can share them between sessions;
+    embed(faces) defaults to calling the model directly and can be swapped
+    for a shared batcher (see batcher.InferenceBatcher).
+
+    independent_frames is for inputs whose frames aren't a continuous view
+    (a folder of photos, a video read with a large stride): boxes aren't
+    tracked from one frame to the next and a single match confirms a face.
+    """
+
+    def __init__(self, course, semester, model, roster, attendance_sync, gallery=None,
+                 recognition_log=None, source=None, verbose=True, embed=None, independent_frames=False):
+        self.course = course
+        self.semester = semester
+        self.model = model
+        self.roster = roster
+        self.attendance_sync = attendance_sync
+        self.recognition_log = recognition_log
+        self.source = source
+        self.verbose = verbose
+        self.embed = embed if embed is not None else partial(embed_faces, model)
+
+        self.gallery = gallery if gallery is not None else load_gallery(course, semester, model)
+        self.threshold = float(os.environ.get("FACE_THRESHOLD", DEFAULT_THRESHOLDS[self.gallery.metric]))
+
+        self.attendance_file = os.path.join(BASE_DIR, "attendance.csv")
+        if not os.path.exists(self.attendance_file):
+            with open(self.attendance_file, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["Name", "Status"])
+
+        # Faces are tracked across recognitions so the embedding model only runs
+        # for new or still-unconfirmed tracks; identity comes from a track's votes.
+        self.detector = FaceDetector(work_width=int(os.environ.get("FACE_DETECT_WIDTH", 480)))
+        self.independent_frames = independent_frames
+        self.tracker = FaceTracker(min_votes=1) if independent_frames else FaceTracker()
+        self.quality = FaceQuality() if QUALITY_GATE else None
+        self.marked = set()
+        self.watcher = None
+        self.enroll_detector = None
+
+        # Throughput counters (detect + embed + match time only)
+        self.faces = 0
+        self.embedded = 0
+        self.matched = 0
+        self.skipped = 0
+        self.seconds = 0.0
+        self.embed_seconds = 0.0
+        # Shadow-mode counters: rejected crops embedded only to measure them
+        self.shadow_embedded = 0
+        self.shadow_matched = 0
+        self.started = time.perf_counter()
+
+    # --- RECOGNITION ---
+    def recognize(self, frame):
+        """Detect, track, embed and match one frame. Returns (labels, status, new roll numbers)."""
+        started = time.perf_counter()
+        boxes = self.detector.detect(frame)
+        if self.independent_frames:
+            # IoU against another picture's boxes would mix different people's votes
+            self.tracker.reset()
+        tracks = self.tracker.update(boxes)
+
+        # Empty frames stop here: no crop, no embedding, no matching
+        if self.quality is None:
+            to_embed = [i for i, track in enumerate(tracks) if track.needs_embedding()]
+            faces = [self.detector.crop(frame, boxes[i]) for i in to_embed]
+            shadow = []
+        else:
+            to_embed, faces, shadow = self.select_crops(frame, boxes, tracks)
+
+        embed_started = time.perf_counter()
+        embeddings = self.embed(faces + shadow)
+        self.embed_seconds += time.perf_counter() - embed_started
+        gallery = self.gallery  # may be swapped by the gallery watcher at any time
+        matches = gallery.match(embeddings, self.threshold) if len(faces) + len(shadow) else []
+        for i, (identity, dist) in zip(to_embed, matches):
+            tracks[i].observe(identity, dist)
+            self.matched += identity is not None
+        for identity, _ in matches[len(to_embed):]:
+            self.shadow_matched += identity is not None
+
+        elapsed = time.perf_counter() - started
+        self.seconds += elapsed
+        self.faces += len(boxes)
+        self.embedded += len(to_embed)
+        self.shadow_embedded += len(shadow)
+
+        if self.recognition_log:
+            self.recognition_log.write(self.source.frame_index, self.source.position,
+                                       [(t.identity, t.last_distance) for t in tracks], elapsed * 1000)
+
+        labels = []
+        present = []
+        for box, track in zip(boxes, tracks):
+            identity = track.identity
+            labels.append((box, f"{identity or 'Unknown'} #{track.id}", identity is not None))
+            if identity is not None and identity not in self.marked:
+                self.marked.add(identity)
+                present.append(extract_roll_number(identity))
+
+        known = sum(1 for t in tracks if t.identity is not None)
+        if not boxes:
+            status = "No face detected"
+        elif known:
+            status = f"{known}/{len(boxes)} present"
+        else:
+            status = "Unknown"
+
+        if self.verbose and self.seconds > 0:
+            stats = self.stats()
+            print(f"[{self.course} / {self.semester}] Recognized {known}/{len(boxes)} face(s), "
+                  f"embedded {len(to_embed)} | {stats['faces_per_s']:.1f} faces/s, "
+                  f"{stats['embeddings_per_min']:.1f} embeddings/min, "
+                  f"gated {stats['gated']}/{stats['frames']} empty frame(s)")
+        return labels, status, present
+
+    def select_crops(self, frame, boxes, tracks):
+        """
+        Quality-gate the crops of tracks that are due an embedding.
+
+        Every collecting track offers its scored crop; the ones due an
+        embedding get their best crop so far, if it passed the gate. Returns
+        (track indices, their crops, rejected crops to embed in shadow mode).
+        """
+        to_embed, faces, shadow = [], [], []
+        for i, track in enumerate(tracks):
+            if not track.collecting(QUALITY_WINDOW):
+                continue
+            face = self.detector.raw_crop(frame, boxes[i])
+            if not face.size:
+                continue
+            eyes = self.detector.find_eyes(face) if min(face.shape[:2]) >= self.quality.min_size else []
+            score, reason = self.quality.assess(face, eyes)
+            aligned = None
+            if reason is None and score > track.best_quality:
+                aligned = self.detector.align_eyes(face, eyes) if self.detector.align else face
+                track.offer(aligned.copy(), score)  # frames may be reused by the capture
+            elif reason is not None and QUALITY_SHADOW and track.needs_embedding():
+                shadow.append(self.detector.align_eyes(face, eyes) if self.detector.align else face)
+
+            if not track.needs_embedding():
+                continue
+            if track.best_face is not None:
+                to_embed.append(i)
+                faces.append(track.take_best())
+            else:
+                self.skipped += 1  # an embedding the model didn't have to run
+        return to_embed, faces, shadow
+
+    # --- GALLERY HOT-RELOAD ---
+    def watch_gallery(self, interval=None):
+        """Pick up photos added, replaced or removed in the Faces folder while running."""
+        if not isinstance(self.gallery, Gallery):
+            print("⚠ Gallery hot-reload is not available with the campus index (FACE_ANN_INDEX)")
+            return None
+        if GALLERY_SOURCE == "db":
+            print("⚠ Gallery hot-reload watches the Faces folder; not available with FACE_GALLERY_SOURCE=db")
+            return None
+        interval = interval or float(os.environ.get("FACE_GALLERY_POLL", 2.0))
+        cache = EmbeddingCache(cache_path_for(BASE_DIR, self.course, self.semester, self.model.name),
+                               self.model.name).load()
+        self.watcher = GalleryWatcher(faces_dir_for(self.course, self.semester), cache, self.represent,
+                                      self.update_gallery, interval, label=f"{self.course} / {self.semester}")
+        return self.watcher.start()
+
+    def represent(self, img_path):
+        """
+        Enrollment embedding of an image file, like model.represent but run
+        through self.embed: on the watcher thread the model is also busy with
+        recognition, so its calls go the same way (the batcher, in worker.py).
+        """
+        image = cv2.imread(img_path)
+        if image is None:
+            return None
+        if self.enroll_detector is None:
+            self.enroll_detector = FaceDetector()  # watcher thread only; self.detector is the inference thread's
+        return self.embed([enrollment_face(image, self.enroll_detector)])[0]
+
+    def update_gallery(self, images, changed):
+        """Rebuild the students whose photos changed, from all of their current photos."""
+        affected = {student_key(stem) for stem in changed}
+        prototypes = student_prototypes({stem: emb for stem, emb in images.items() if student_key(stem) in affected})
+        removals = [name for name in self.gallery.names if student_key(name) in affected]
+        # Build the new matrix off to the side, then swap: recognition never waits
+        self.gallery = self.gallery.updated(prototypes, removals)
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+
+    # --- ATTENDANCE ---
+    def mark_attendance(self, roll_no):
+        if not roll_no:
+            return
+
+        try:
+            student = self.roster.lookup(roll_no)
+            if student is not None:
+                student_id = student["id"]
+                student_name = student["name"]
+
+                # CSV write (local backup)
+                with open(self.attendance_file, "r") as f:
+                    existing = f.read()
+                if student_name not in existing:
+                    with open(self.attendance_file, "a", newline="") as f:
+                        writer = csv.writer(f)
+                        writer.writerow([student_name, "Present"])
+
+                # Journal + send to server in the background
+                self.attendance_sync.mark(student_id, class_id=1, status="present")
+                print(f"✔ Attendance queued for {student_name}")
+            else:
+                print(f"❌ Student not found for roll number {roll_no}")
+
+        except Exception as e:
+            print(f"❌ Error recording attendance: {e}")
+
+    def stats(self):
+        minutes = (time.perf_counter() - self.started) / 60
+        gate = self.detector.stats()
+        quality = self.quality.stats() if self.quality is not None else {"assessed": 0, "rejected": 0,
+                                                                          "rejected_by": {}, "rejected_pct": 0.0}
+        embed_ms = 1000 * self.embed_seconds / max(self.embedded + self.shadow_embedded, 1)
+        return {
+            "gallery": len(self.gallery),
+            "faces": self.faces,
+            "embedded": self.embedded,
+            "matched": self.matched,
+            "match_rate": self.matched / self.embedded if self.embedded else 0.0,
+            "quality_assessed": quality["assessed"],
+            "quality_rejected": quality["rejected"],
+            "quality_rejected_by": quality["rejected_by"],
+            "quality_rejected_pct": quality["rejected_pct"],
+            # Compute saved: skipped embeddings at the measured per-face model time
+            "quality_skipped": self.skipped,
+            "quality_saved_ms": self.skipped * embed_ms,
+            "shadow_embedded": self.shadow_embedded,
+            "shadow_match_rate": self.shadow_matched / self.shadow_embedded if self.shadow_embedded else None,
+            "marked": len(self.marked),
+            "gallery_reloads": self.watcher.reloads if self.watcher is not None else 0,
+            "faces_per_s": self.faces / self.seconds if self.seconds > 0 else 0.0,
+            "embeddings_per_min": self.embedded / max(minutes, 1e-9),
+            "frames": gate["frames"],
+            "gated": gate["gated"],
+            "gated_pct": gate["gated_pct"],
+        }
+
+    def print_summary(self):
+        stats = self.stats()
+        if self.seconds > 0:
+            print(f"Processed {stats['faces']} face(s) at {stats['faces_per_s']:.1f} faces/s, "
+                  f"embedded {stats['embedded']} ({stats['marked']} student(s) marked)")
+        print(f"Detector gate: {stats['gated']}/{stats['frames']} frame(s) skipped inference "
+              f"({stats['gated_pct']:.0f}%)")
+        if self.quality is not None:
+            reasons = ", ".join(f"{n} {reason}" for reason, n in sorted(stats["quality_rejected_by"].items()))
+            print(f"Quality gate: rejected {stats['quality_rejected']}/{stats['quality_assessed']} crop(s) "
+                  f"({stats['quality_rejected_pct']:.0f}%{': ' + reasons if reasons else ''}), "
+                  f"{stats['quality_skipped']} embedding(s) skipped (~{stats['quality_saved_ms'] / 1000:.1f}s of model time); "
+                  f"{stats['match_rate']:.0%} of embedded crops matched")
+            if stats["shadow_match_rate"] is not None:
+                print(f"  Shadow: rejected crops would have matched {stats['shadow_match_rate']:.0%} "
+                      f"({stats['shadow_embedded']} embedded)")
+
+
+def draw_overlay(frame, labels, status, footer=None):
+    """Boxes and names for each face, the session status and an optional stats line."""
+    for (x, y, w, h), label, known in labels:
+        color = (0, 255, 0) if known else (0, 0, 255)
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, label, (x, max(20, y - 8)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    cv2.putText(frame, status, (20, 40),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    if footer:
+        cv2.putText(frame, footer, (20, frame.shape[0] - 15),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 1)
+    return frame
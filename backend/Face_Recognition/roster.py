@@ -0,0 +1,80 @@
+import time
+
+import requests
+
+
+class Roster:
+    """
+    In-memory roll number -> {"id", "name"} map for one course/semester, or
+    for every student with campus=True: a campus index (FACE_ANN_INDEX) can
+    match a student of any class, who must not come back as unknown.
+
+    Loaded once from GET /roster and refreshed only when the TTL expires or
+    a roll number is missing (at most once per miss_cooldown seconds, so an
+    unknown roll number can't turn every lookup into a round trip). If the
+    roster can't be fetched, lookups fall back to GET /getstudent/rollnum.
+    """
+
+    def __init__(self, backend_url, course, semester, ttl=600, miss_cooldown=30, timeout=5, session=None,
+                 campus=False):
+        self.backend_url = backend_url
+        self.course = course
+        self.semester = semester
+        self.campus = campus
+        self.ttl = ttl
+        self.miss_cooldown = miss_cooldown
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+        self.students = {}
+        self.loaded_at = None
+        self.last_attempt = float("-inf")
+
+    def refresh(self):
+        """Reload the roster. Returns True on success."""
+        self.last_attempt = time.monotonic()
+        try:
+            res = self.session.get(
+                f"{self.backend_url}/roster",
+                params={} if self.campus else {"course": self.course, "semester": self.semester},
+                timeout=self.timeout,
+            )
+            if res.status_code != 200:
+                print(f"❌ Could not load roster: {res.status_code} {res.text}")
+                return False
+            students = res.json()
+        except Exception as e:
+            print(f"❌ Could not load roster: {e}")
+            return False
+
+        self.students = students
+        self.loaded_at = time.monotonic()
+        scope = "the whole campus" if self.campus else f"{self.course} / {self.semester}"
+        print(f"Roster loaded: {len(students)} student(s) for {scope}")
+        return True
+
+    def lookup(self, roll_no):
+        """{"id", "name"} for a roll number, or None if the backend doesn't know it."""
+        now = time.monotonic()
+        can_refresh = now - self.last_attempt > self.miss_cooldown
+
+        if can_refresh and (self.loaded_at is None or now - self.loaded_at > self.ttl):
+            self.refresh()
+            can_refresh = False
+
+        student = self.students.get(roll_no)
+        if student is None and can_refresh:
+            self.refresh()
+            student = self.students.get(roll_no)
+
+        if student is None and self.loaded_at is None:
+            return self._fetch_one(roll_no)
+        return student
+
+    def _fetch_one(self, roll_no):
+        try:
+            res = self.session.get(f"{self.backend_url}/getstudent/rollnum/{roll_no}", timeout=self.timeout)
+            return res.json() if res.status_code == 200 else None
+        except Exception as e:
+            print(f"❌ Error looking up roll number {roll_no}: {e}")
+            return None
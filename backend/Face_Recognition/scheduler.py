@@ -0,0 +1,76 @@
+import time
+from collections import deque
+
+import cv2
+
+
+class MotionScheduler:
+    """
+    Decides when the next recognition should run from a cheap motion score.
+
+    Every captured frame is shrunk to work_width, blurred and diffed against
+    the previous one; the score is the fraction of pixels that changed by
+    more than pixel_delta. Activity follows the score up immediately and
+    decays with a half_life (seconds). The recognition interval slides from
+    max_interval (static scene heartbeat) down to min_interval (the rate
+    ceiling) as activity approaches motion_threshold.
+    """
+
+    def __init__(self, min_interval=0.5, max_interval=10.0, motion_threshold=0.02,
+                 pixel_delta=25, work_width=160, half_life=3.0):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.motion_threshold = motion_threshold
+        self.pixel_delta = pixel_delta
+        self.work_width = work_width
+        self.half_life = half_life
+
+        self.prev = None
+        self.score = 0.0
+        self.activity = 0.0
+        self.last_observed = None
+        self.inference_times = deque()
+
+    def observe(self, frame):
+        """Update the motion score with a new frame. Returns the raw score."""
+        h, w = frame.shape[:2]
+        scale = min(1.0, self.work_width / w)
+        small = cv2.resize(frame, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        now = time.monotonic()
+        if self.last_observed is not None:
+            self.activity *= 0.5 ** ((now - self.last_observed) / self.half_life)
+        self.last_observed = now
+
+        if self.prev is not None and self.prev.shape == gray.shape:
+            changed = cv2.absdiff(gray, self.prev) > self.pixel_delta
+            self.score = float(changed.mean())
+            self.activity = max(self.activity, self.score)
+        self.prev = gray
+        return self.score
+
+    def interval(self):
+        level = min(1.0, self.activity / self.motion_threshold) if self.motion_threshold > 0 else 1.0
+        return self.max_interval - level * (self.max_interval - self.min_interval)
+
+    def due(self, since_last):
+        return since_last >= self.interval()
+
+    def record_inference(self):
+        now = time.monotonic()
+        self.inference_times.append(now)
+        while self.inference_times and now - self.inference_times[0] > 60:
+            self.inference_times.popleft()
+
+    def inferences_per_minute(self):
+        now = time.monotonic()
+        return sum(1 for t in self.inference_times if now - t <= 60)
+
+    def stats(self):
+        return {
+            "motion": self.score,
+            "activity": self.activity,
+            "interval": self.interval(),
+            "inferences_per_min": self.inferences_per_minute(),
+        }
@@ -0,0 +1,114 @@
+import csv
+import os
+import time
+
+import cv2
+
+from embedding_cache import IMAGE_EXTENSIONS
+
+
+class CameraSource:
+    """cv2.VideoCapture on a webcam index or a video file, with a frame counter."""
+
+    def __init__(self, target, paced=False):
+        self.target = target
+        self.cap = cv2.VideoCapture(target)
+        if not self.cap.isOpened():
+            raise RuntimeError(f"Could not open video source: {target}")
+
+        self.frame_index = -1
+        # Video files decode as fast as we ask; pacing replays them at their own fps
+        fps = self.cap.get(cv2.CAP_PROP_FPS) if paced else 0
+        self.frame_period = 1.0 / fps if fps and fps > 0 else 0.0
+        self.next_frame_at = None
+
+    @property
+    def position(self):
+        """Frame position in ms (media time for files, wall time for cameras)."""
+        return self.cap.get(cv2.CAP_PROP_POS_MSEC)
+
+    def read(self):
+        if self.frame_period:
+            now = time.monotonic()
+            if self.next_frame_at is None:
+                self.next_frame_at = now
+            elif self.next_frame_at > now:
+                time.sleep(self.next_frame_at - now)
+            self.next_frame_at += self.frame_period
+
+        ret, frame = self.cap.read()
+        if ret:
+            self.frame_index += 1
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource:
+    """Images in a folder, in sorted file-name order, read like a video."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = sorted(
+            name for name in os.listdir(directory) if name.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        self.frame_index = -1
+
+    @property
+    def position(self):
+        return self.files[self.frame_index] if 0 <= self.frame_index < len(self.files) else ""
+
+    def read(self):
+        while self.frame_index + 1 < len(self.files):
+            self.frame_index += 1
+            frame = cv2.imread(os.path.join(self.directory, self.files[self.frame_index]))
+            if frame is not None:
+                return True, frame
+            print(f"⚠ Skipping unreadable image {self.files[self.frame_index]}")
+        return False, None
+
+    def release(self):
+        pass
+
+
+def open_source(spec="0", paced=True):
+    """
+    Open a webcam index ("0", "1", ...), a video file or a directory of images.
+
+    paced only applies to video files: True replays them in real time, False
+    decodes frames as fast as they are consumed.
+    """
+    if spec.isdigit():
+        return CameraSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    if os.path.isfile(spec):
+        return CameraSource(spec, paced=paced)
+    raise FileNotFoundError(f"Input source not found: {spec}")
+
+
+class RecognitionLog:
+    """Per-frame CSV log: one row per recognized frame."""
+
+    FIELDS = ["frame", "position", "faces", "matched", "identities", "distances", "latency_ms"]
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=self.FIELDS)
+        self.writer.writeheader()
+
+    def write(self, frame, position, matches, latency_ms):
+        self.writer.writerow({
+            "frame": frame,
+            "position": position,
+            "faces": len(matches),
+            "matched": sum(1 for identity, _ in matches if identity is not None),
+            "identities": ";".join(identity or "Unknown" for identity, _ in matches),
+            "distances": ";".join(f"{d:.4f}" for _, d in matches),
+            "latency_ms": f"{latency_ms:.2f}",
+        })
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import pytest
+
+import recognizer
+from ann_index import IVFIndex, load_cached_galleries
+from gallery import Gallery
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_ivf_full_probe_matches_gallery(stub_gallery, metric):
+    rows, queries, _ = stub_gallery
+    gallery = Gallery.from_dict(rows, metric=metric)
+    index = IVFIndex.from_gallery(gallery, nlist=8)
+
+    # nprobe == nlist scans every cell: an exact search
+    exact = index.match(queries, threshold=float("inf"), nprobe=index.nlist)
+    expected = gallery.match(queries, threshold=float("inf"))
+    assert [name for name, _ in exact] == [name for name, _ in expected]
+    np.testing.assert_allclose([d for _, d in exact], [d for _, d in expected], rtol=1e-3, atol=1e-3)
+
+
+def test_ivf_recall_grows_with_nprobe(stub_gallery):
+    rows, queries, names = stub_gallery
+    index = IVFIndex.from_gallery(Gallery.from_dict(rows), nlist=8)
+    hits = [sum(name == truth for (name, _), truth in zip(index.match(queries, float("inf"), nprobe=n), names))
+            for n in (1, 4, 8)]
+    assert hits == sorted(hits)
+    assert hits[-1] == len(names)
+
+
+def test_ivf_rows_are_named_by_identity(stub_gallery):
+    rows, queries, names = stub_gallery
+    index = IVFIndex.from_gallery(Gallery.from_dict(rows))
+    assert len(index) == sum(len(r) for r in rows.values())
+    assert set(index.names) == set(names)
+
+
+def test_ivf_save_load_round_trip(stub_gallery, tmp_path):
+    rows, queries, _ = stub_gallery
+    index = IVFIndex.from_gallery(Gallery.from_dict(rows), nlist=8, nprobe=3)
+    path = str(tmp_path / "ivf.npz")
+    index.save(path)
+    reloaded = IVFIndex.load(path)
+    assert reloaded.nprobe == 3
+    assert reloaded.match(queries, float("inf")) == index.match(queries, float("inf"))
+
+
+def test_cached_galleries_are_grouped_by_student(tmp_path):
+    embeddings = np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32)
+    os.makedirs(tmp_path / "B.Tech - ECE" / "7")
+    np.savez(tmp_path / "B.Tech - ECE" / "7" / "stub.npz",
+             names=np.array(["A(1).jpg", "A(1) side.jpg", "B(2).jpg"]), embeddings=embeddings, model=np.array("stub"))
+
+    gallery = load_cached_galleries(str(tmp_path), "stub")
+    assert gallery.names == ["A(1)", "B(2)"]
+    index = IVFIndex.from_gallery(gallery)
+    assert [name for name, _ in index.match(embeddings, float("inf"))] == ["A(1)", "A(1)", "B(2)"]
+
+
+def test_campus_index_skips_encoding_the_class(stub_gallery, tmp_path, monkeypatch):
+    rows, queries, _ = stub_gallery
+    path = str(tmp_path / "campus.npz")
+    IVFIndex.from_gallery(Gallery.from_dict(rows), nlist=8).save(path)
+    monkeypatch.setattr(recognizer, "ANN_INDEX_PATH", path)
+
+    class NoModel:
+        name = "no-model"
+
+        def represent(self, img_path):
+            raise AssertionError(f"encoded {img_path}")
+
+    index = recognizer.load_gallery("B.Tech - ECE", "7", NoModel())
+    assert isinstance(index, IVFIndex)
+    assert len(index) == sum(len(r) for r in rows.values())
+    assert not os.path.exists(recognizer.cache_path_for(recognizer.BASE_DIR, "B.Tech - ECE", "7", "no-model"))
@@ -0,0 +1,144 @@
+import sqlite3
+
+import pytest
+import requests
+
+from attendance_sync import AttendanceSync
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="{}"):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeSession:
+    """Stands in for requests.Session: answers from bulk_status and row_status(student_id), records the calls."""
+
+    def __init__(self, bulk_status=200, row_status=lambda student_id: 200):
+        self.bulk_status = bulk_status
+        self.row_status = row_status
+        self.calls = []
+
+    def post(self, url, json=None, timeout=None):
+        if url.endswith("/attendance/bulk"):
+            self.calls.append(("bulk", len(json)))
+            status = self.bulk_status
+        else:
+            self.calls.append(("row", json["student_id"]))
+            status = self.row_status(json["student_id"])
+        if isinstance(status, Exception):
+            raise status
+        return FakeResponse(status)
+
+
+@pytest.fixture
+def make_sync(tmp_path):
+    syncs = []
+
+    def make(session, **kwargs):
+        sync = AttendanceSync("http://backend", str(tmp_path / "journal.sqlite3"), session=session, **kwargs)
+        syncs.append(sync)
+        return sync
+
+    yield make
+    for sync in syncs:
+        sync.db.close()
+
+
+def pending(sync):
+    return sync.db.execute("SELECT student_id, attempts, last_error FROM pending ORDER BY id").fetchall()
+
+
+def failed(sync):
+    return sync.db.execute("SELECT student_id, attempts, last_error FROM failed ORDER BY id").fetchall()
+
+
+def mark_all(sync, student_ids):
+    for student_id in student_ids:
+        sync.mark(student_id)
+
+
+def test_bulk_accepts_the_batch(make_sync):
+    session = FakeSession()
+    sync = make_sync(session)
+    mark_all(sync, [1, 2, 3])
+
+    assert sync._flush() is False
+    assert session.calls == [("bulk", 3)]
+    assert pending(sync) == []
+    assert sync.sent == 3
+
+
+def test_refused_bulk_falls_back_to_rows(make_sync):
+    # 404: an older backend without /attendance/bulk; 400 from a row means it will never be accepted
+    session = FakeSession(bulk_status=404, row_status=lambda student_id: 400 if student_id == 2 else 200)
+    sync = make_sync(session)
+    mark_all(sync, [1, 2, 3])
+
+    sync._flush()
+    assert session.calls == [("bulk", 3), ("row", 1), ("row", 2), ("row", 3)]
+    assert pending(sync) == []
+
+
+def test_bulk_500_falls_back_to_rows_and_keeps_the_bad_one(make_sync):
+    session = FakeSession(bulk_status=500, row_status=lambda student_id: 500 if student_id == 2 else 200)
+    sync = make_sync(session)
+    mark_all(sync, [1, 2, 3])
+
+    sync._flush()
+    assert session.calls == [("bulk", 3), ("row", 1), ("row", 2), ("row", 3)]
+    assert pending(sync) == [(2, 1, "500 {}")]
+    assert sync.sent == 2
+
+
+@pytest.mark.parametrize("status", [502, 503, 504])
+def test_unavailable_backend_keeps_the_batch(make_sync, status):
+    session = FakeSession(bulk_status=status)
+    sync = make_sync(session)
+    mark_all(sync, [1, 2])
+
+    assert sync._flush() is False
+    assert session.calls == [("bulk", 2)]  # no per-row retries against a backend that is down
+    assert [(student_id, attempts) for student_id, attempts, _ in pending(sync)] == [(1, 1), (2, 1)]
+
+
+def test_unreachable_backend_keeps_the_rest_of_the_rows(make_sync):
+    error = requests.ConnectionError("refused")
+    session = FakeSession(bulk_status=500, row_status=lambda student_id: error if student_id == 2 else 200)
+    sync = make_sync(session)
+    mark_all(sync, [1, 2, 3])
+
+    sync._flush()
+    # Row 3 is never sent: the backend went away at row 2
+    assert session.calls == [("bulk", 3), ("row", 1), ("row", 2)]
+    assert [student_id for student_id, _, _ in pending(sync)] == [2, 3]
+
+
+def test_gives_up_after_max_attempts(make_sync):
+    session = FakeSession(bulk_status=500, row_status=lambda student_id: 500 if student_id == 2 else 200)
+    sync = make_sync(session, max_attempts=3)
+    mark_all(sync, [1, 2])
+
+    for attempt in (1, 2):
+        sync._flush()
+        assert pending(sync) == [(2, attempt, "500 {}")]
+    sync._flush()
+
+    assert pending(sync) == []
+    assert failed(sync) == [(2, 3, "500 {}")]
+    assert sync.stats()["given_up"] == 1
+    assert sync.sent == 1
+
+
+def test_journal_survives_a_restart(make_sync, tmp_path):
+    sync = make_sync(FakeSession(bulk_status=503))
+    mark_all(sync, [7])
+    sync._flush()
+    sync.db.close()
+
+    reopened = make_sync(FakeSession())
+    assert reopened.backlog() == 1
+    reopened._flush()
+    assert reopened.backlog() == 0
+    assert sqlite3.connect(str(tmp_path / "journal.sqlite3")).execute("SELECT COUNT(*) FROM failed").fetchone() == (0,)
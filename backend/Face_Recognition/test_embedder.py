@@ -0,0 +1,66 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+from detector import FaceDetector
+from embedder import StubBackend, backend_name, enrollment_face, load_backend
+from face_batch import embed_faces
+from gallery import Gallery
+from recognizer import RecognitionSession
+
+
+def test_stub_backend_is_deterministic(model, faces_dir):
+    image = cv2.imread(os.path.join(faces_dir, "Annsh(22001008008).jpeg"))
+    assert image is not None
+    face = enrollment_face(image, FaceDetector())
+    first = embed_faces(model, [face])
+    second = embed_faces(StubBackend(), [face])
+    assert first.shape == (1, model.output_shape)
+    np.testing.assert_array_equal(first, second)
+
+
+def test_stub_represent_matches_batched_path(model, faces_dir):
+    path = os.path.join(faces_dir, "Keshav(22001008024).jpeg")
+    batched = embed_faces(model, [enrollment_face(cv2.imread(path), FaceDetector())])[0]
+    np.testing.assert_allclose(model.represent(path), batched, rtol=1e-6)
+
+
+def test_gallery_watcher_encodes_through_session_embed(model, faces_dir):
+    # The watcher thread must not call the model behind the batcher's back
+    calls = []
+
+    def embed(faces):
+        calls.append(len(faces))
+        return embed_faces(model, faces)
+
+    gallery = Gallery([], np.zeros((0, model.output_shape), dtype=np.float32))
+    session = RecognitionSession("B.Tech - ECE", "7", model, None, None, gallery, verbose=False, embed=embed)
+    path = os.path.join(faces_dir, "Keshav(22001008024).jpeg")
+    np.testing.assert_allclose(session.represent(path), model.represent(path), rtol=1e-6)
+    assert calls == [1]
+
+
+def test_stub_embeddings_keep_similar_faces_close(model):
+    rng = np.random.default_rng(1)
+    face = rng.integers(0, 256, (64, 64, 3)).astype(np.uint8)
+    noisy = np.clip(face + rng.normal(0, 8, face.shape), 0, 255).astype(np.uint8)
+    other = rng.integers(0, 256, (64, 64, 3)).astype(np.uint8)
+    a, b, c = embed_faces(model, [face, noisy, other])
+    assert np.linalg.norm(a - b) < np.linalg.norm(a - c)
+
+
+def test_backend_names_are_cache_keys():
+    assert backend_name("stub") == "stub"
+    assert backend_name("deepface") == "Facenet"
+    assert backend_name("onnx", int8=True) == "Facenet-onnx-int8"
+    # deepface has no quantized file: int8 doesn't change its name
+    assert backend_name("deepface", int8=True) == "Facenet"
+
+
+def test_unknown_backend_and_missing_model_file(tmp_path):
+    with pytest.raises(ValueError):
+        load_backend("nope")
+    with pytest.raises(FileNotFoundError):
+        load_backend("onnx", model_dir=str(tmp_path))
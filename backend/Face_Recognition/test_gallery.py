@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from gallery import Gallery
+
+
+def brute_force(gallery_rows, queries, metric):
+    """(names of the closest identity, distances) by looping over every (name, row) pair."""
+    names, dists = [], []
+    for q in queries:
+        best = (None, float("inf"))
+        for name, rows in gallery_rows.items():
+            for row in rows:
+                if metric == "euclidean":
+                    d = float(np.linalg.norm(q - row))
+                else:
+                    d = float(1.0 - q @ row / (np.linalg.norm(q) * np.linalg.norm(row)))
+                if d < best[1]:
+                    best = (name, d)
+        names.append(best[0])
+        dists.append(best[1])
+    return names, np.array(dists)
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_gallery_matches_brute_force(stub_gallery, metric):
+    rows, queries, names = stub_gallery
+    gallery = Gallery.from_dict(rows, metric=metric)
+
+    expected_names, expected_dists = brute_force(rows, queries, metric)
+    matched = gallery.match(queries, threshold=float("inf"))
+    assert [name for name, _ in matched] == expected_names
+    # Gallery uses |q|^2 + |r|^2 - 2 q.r in float32: close, not bit-equal, to the direct difference
+    np.testing.assert_allclose([d for _, d in matched], expected_dists, rtol=1e-3, atol=1e-3)
+    # Noisy copies of a student's face land on that student
+    assert expected_names == names
+
+
+@pytest.mark.parametrize("metric", ["euclidean", "cosine"])
+def test_gallery_top_k_is_sorted_brute_force(stub_gallery, metric):
+    rows, queries, _ = stub_gallery
+    gallery = Gallery.from_dict(rows, metric=metric)
+
+    top = gallery.top_k(queries[0], k=5)
+    per_identity = {name: brute_force({name: r}, queries[:1], metric)[1][0] for name, r in rows.items()}
+    expected = sorted(per_identity.items(), key=lambda item: item[1])[:5]
+    assert [name for name, _ in top] == [name for name, _ in expected]
+    np.testing.assert_allclose([d for _, d in top], [d for _, d in expected], rtol=1e-3, atol=1e-3)
+
+
+def test_match_threshold_and_empty_gallery(stub_gallery):
+    rows, queries, names = stub_gallery
+    gallery = Gallery.from_dict(rows)
+    best = gallery.match(queries[:1], float("inf"))[0]
+    assert gallery.match(queries[:1], best[1] / 2) == [(None, best[1])]
+
+    empty = Gallery([], np.zeros((0, queries.shape[1]), dtype=np.float32))
+    assert empty.match(queries[:2], 1.0) == [(None, float("inf"))] * 2
+
+
+def test_updated_leaves_original_untouched(stub_gallery):
+    rows, queries, names = stub_gallery
+    gallery = Gallery.from_dict(rows)
+    updated = gallery.updated({"New(1)": queries[0]}, removals=[names[0]])
+
+    assert names[0] in gallery.names and "New(1)" not in gallery.names
+    assert names[0] not in updated.names
+    assert updated.best_match(queries[0]) == ("New(1)", pytest.approx(0.0, abs=1e-2))
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from gallery import Gallery
+from gallery_store import file_lock, folder_source, open_gallery, read_header, save_gallery
+
+
+# --- GALLERY FILES ---
+def test_gallery_file_round_trip(stub_gallery, tmp_path):
+    rows, queries, _ = stub_gallery
+    gallery = Gallery.from_dict(rows, metric="cosine")
+    path = str(tmp_path / "stub.gallery")
+
+    assert save_gallery(path, gallery, "stub", source="abc") == 1
+    mapped, header = open_gallery(path)
+    # A read-only view of the file's pages, not a copy
+    assert not mapped.matrix.flags.owndata
+    assert not mapped.matrix.flags.writeable
+    assert header["model"] == "stub"
+    assert header["source"] == "abc"
+    assert mapped.names == gallery.names
+    assert mapped.metric == "cosine"
+    np.testing.assert_array_equal(mapped.owners, gallery.owners)
+    np.testing.assert_array_equal(np.asarray(mapped.matrix), gallery.matrix)
+    assert mapped.match(queries, float("inf")) == gallery.match(queries, float("inf"))
+
+
+def test_gallery_file_versions_and_replaces(stub_gallery, tmp_path):
+    rows, _, _ = stub_gallery
+    path = str(tmp_path / "stub.gallery")
+    save_gallery(path, Gallery.from_dict(rows), "stub")
+    old, _ = open_gallery(path)
+
+    smaller = Gallery.from_dict(dict(list(rows.items())[:5]))
+    assert save_gallery(path, smaller, "stub") == 2
+    new, header = open_gallery(path)
+    assert header["version"] == 2
+    assert new.names == smaller.names
+    # A process still mapping the old version keeps reading valid data
+    assert len(old.names) == len(rows)
+    np.testing.assert_array_equal(np.asarray(old.matrix[:3]), Gallery.from_dict(rows).matrix[:3])
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_empty_gallery_file(tmp_path):
+    path = str(tmp_path / "empty.gallery")
+    save_gallery(path, Gallery([], np.zeros((0, 128), dtype=np.float32)), "stub")
+    gallery, header = open_gallery(path)
+    assert header["rows"] == 0
+    assert len(gallery) == 0
+    assert gallery.match(np.zeros((1, 128), dtype=np.float32), 1.0) == [(None, float("inf"))]
+
+
+def test_not_a_gallery_file(tmp_path):
+    path = tmp_path / "stub.npz"
+    path.write_bytes(b"not a gallery")
+    assert read_header(str(path)) == (None, 0)
+    assert read_header(str(tmp_path / "missing.gallery")) == (None, 0)
+    with pytest.raises(ValueError):
+        open_gallery(str(path))
+
+
+def test_folder_source_follows_the_photos(tmp_path):
+    (tmp_path / "A(1).jpg").write_bytes(b"one")
+    before = folder_source(str(tmp_path))
+    assert folder_source(str(tmp_path)) == before
+    (tmp_path / "notes.txt").write_text("not a photo")
+    assert folder_source(str(tmp_path)) == before
+
+    (tmp_path / "B(2).jpg").write_bytes(b"two")
+    added = folder_source(str(tmp_path))
+    assert added != before
+    (tmp_path / "B(2).jpg").write_bytes(b"two, retaken")
+    assert folder_source(str(tmp_path)) != added
+
+
+def test_file_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "stub.gallery.lock")
+    inside, overlaps = [], []
+
+    def hold():
+        with file_lock(path):
+            overlaps.append(len(inside))
+            inside.append(1)
+            time.sleep(0.05)
+            inside.pop()
+
+    threads = [threading.Thread(target=hold) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert overlaps == [0, 0, 0, 0]
+
+
+# --- SHARED MAPPING MEMORY ---
+@pytest.mark.skipif(not os.path.exists("/proc/self/smaps_rollup"), reason="needs Linux /proc/self/smaps_rollup")
+def test_mapped_gallery_is_shared_between_processes(tmp_path):
+    """
+    Per-process memory of 3 processes holding a 24 MB gallery. RSS counts
+    shared pages in full in every process, so only PSS / USS tell a shared
+    mapping from private copies.
+    """
+    from bench_gallery_store import run
+
+    size, dim, workers = 50000, 128, 3
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((size, dim)).astype(np.float32)
+    queries = rng.standard_normal((4, dim)).astype(np.float32)
+    npy_path = str(tmp_path / "gallery.npy")
+    path = str(tmp_path / "gallery.gallery")
+    np.save(npy_path, embeddings)
+    save_gallery(path, Gallery([str(i) for i in range(size)], embeddings), "stub")
+    matrix_mb = embeddings.nbytes / 2**20
+
+    _, private_pss, private_uss = run("private", path, npy_path, queries, workers)
+    _, mapped_pss, mapped_uss = run("mapped", path, npy_path, queries, workers)
+
+    # A private copy is the whole matrix in every process...
+    assert private_uss > 0.9 * matrix_mb
+    # ...a mapped one only the per-identity bookkeeping, with the matrix pages split between processes
+    assert mapped_uss < 0.5 * matrix_mb
+    assert mapped_pss < 0.75 * private_pss
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+import recognize_pool
+import recognizer
+from ann_index import IVFIndex
+from embedding_cache import cache_path_for
+from gallery import Gallery
+from gallery_store import gallery_path_for
+from recognize_pool import InvalidClass, RecognitionPool
+from recognizer import faces_dir_for
+
+
+@pytest.mark.parametrize("course", ["../..", "..", ".", "", " ", "B.Tech/../../etc", "a\\b", "x\0"])
+def test_class_names_cannot_leave_their_folders(course):
+    for build in (lambda: gallery_path_for("/base", course, "7", "stub"),
+                  lambda: gallery_path_for("/base", "B.Tech - ECE", course, "stub"),
+                  lambda: cache_path_for("/base", course, "7", "stub"),
+                  lambda: faces_dir_for(course, "7")):
+        with pytest.raises(ValueError):
+            build()
+
+
+def test_pool_refuses_traversal_before_queueing():
+    pool = RecognitionPool(workers=1, kind="stub")
+    try:
+        with pytest.raises(InvalidClass):
+            pool.submit("../..", "7", [b""])
+        assert pool.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_campus_index_is_reloaded_only_when_its_file_changes(stub_gallery, tmp_path, monkeypatch):
+    rows, _, _ = stub_gallery
+    path = str(tmp_path / "campus.npz")
+    IVFIndex.from_gallery(Gallery.from_dict(rows), nlist=4).save(path)
+
+    loads = []
+    load_ann_index = recognizer.load_ann_index
+    monkeypatch.setattr(recognizer, "ANN_INDEX_PATH", path)
+    monkeypatch.setattr(recognizer, "load_ann_index", lambda: loads.append(path) or load_ann_index())
+    monkeypatch.setattr(recognize_pool, "GALLERY_POLL", 0.0)
+    monkeypatch.setattr(recognize_pool, "_galleries", {})
+    monkeypatch.setattr(recognize_pool, "_ann_index", None)
+    monkeypatch.setattr(recognize_pool, "_model", None)  # no class gallery to encode or publish
+
+    first, _ = recognize_pool._gallery("B.Tech - ECE", "7")
+    again, _ = recognize_pool._gallery("B.Tech - ECE", "7")
+    other, _ = recognize_pool._gallery("B.Tech - CSE", "5")
+    assert again is first and other is first
+    assert len(loads) == 1
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    reloaded, _ = recognize_pool._gallery("B.Tech - ECE", "7")
+    assert reloaded is not first
+    assert len(loads) == 2
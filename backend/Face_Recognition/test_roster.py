@@ -0,0 +1,51 @@
+from roster import Roster
+
+STUDENTS = {
+    "22001008008": {"id": 1, "name": "Annsh", "course": "B.Tech - ECE", "semester": "7"},
+    "22001003011": {"id": 2, "name": "Riya", "course": "B.Tech - CSE", "semester": "5"},
+}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+        self.text = str(body)
+
+    def json(self):
+        return self.body
+
+
+class FakeSession:
+    """Answers GET /roster like app.py: filtered by whichever of course/semester are given."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append((url.rsplit("/", 1)[-1], params))
+        params = params or {}
+        return FakeResponse(200, {
+            roll: {"id": s["id"], "name": s["name"]} for roll, s in STUDENTS.items()
+            if params.get("course", s["course"]) == s["course"]
+            and params.get("semester", s["semester"]) == s["semester"]
+        })
+
+
+def test_class_roster_only_knows_its_class():
+    session = FakeSession()
+    roster = Roster("http://backend", "B.Tech - ECE", "7", session=session)
+    roster.refresh()
+    assert session.calls == [("roster", {"course": "B.Tech - ECE", "semester": "7"})]
+    assert roster.lookup("22001008008") == {"id": 1, "name": "Annsh"}
+    assert roster.lookup("22001003011") is None
+
+
+def test_campus_roster_knows_students_of_other_classes():
+    # A campus index (FACE_ANN_INDEX) can match a CSE student in an ECE session
+    session = FakeSession()
+    roster = Roster("http://backend", "B.Tech - ECE", "7", session=session, campus=True)
+    roster.refresh()
+    assert session.calls == [("roster", {})]
+    assert roster.lookup("22001003011") == {"id": 2, "name": "Riya"}
+    assert len(session.calls) == 1
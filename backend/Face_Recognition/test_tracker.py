@@ -0,0 +1,110 @@
+import os
+
+import cv2
+
+from detector import FaceDetector
+from embedder import enrollment_face
+from face_batch import embed_faces
+from gallery import Gallery
+from recognizer import RecognitionSession, identity_for
+from sources import ImageDirectorySource
+from tracker import FaceTracker, Track
+
+
+def test_track_needs_min_votes():
+    track = Track(1, (0, 0, 50, 50), min_votes=2, confirm_ratio=0.6)
+    track.observe("Annsh(22001008008)", 5.0)
+    assert track.identity is None
+    track.observe("Annsh(22001008008)", 5.0)
+    assert track.identity == "Annsh(22001008008)"
+
+
+def test_track_needs_consistent_votes():
+    track = Track(1, (0, 0, 50, 50), min_votes=2, confirm_ratio=0.6)
+    for identity in ("A", "B", "A", "B"):
+        track.observe(identity, 5.0)
+    # 2 of 4 votes is below the 0.6 ratio
+    assert track.identity is None
+    track.observe("A", 5.0)
+    assert track.identity == "A"
+
+
+def test_track_unknown_majority_is_not_an_identity():
+    track = Track(1, (0, 0, 50, 50), min_votes=2)
+    for identity in (None, None, None):
+        track.observe(identity, 20.0)
+    assert track.identity is None
+    assert track.needs_embedding()
+
+
+def test_confirmed_track_refreshes_occasionally():
+    tracker = FaceTracker(min_votes=1, confirm_ratio=0.5, refresh_every=3)
+    track = tracker.update([(10, 10, 50, 50)])[0]
+    track.observe("A", 5.0)
+    assert not track.needs_embedding()
+    for _ in range(3):
+        tracker.update([(10, 10, 50, 50)])
+    assert track.needs_embedding()
+
+
+def test_tracker_follows_moving_box_and_drops_lost_tracks():
+    tracker = FaceTracker(iou_threshold=0.3, max_missed=1)
+    first = tracker.update([(10, 10, 50, 50)])[0]
+    first.observe("A", 5.0)
+    assert tracker.update([(14, 12, 50, 50)])[0] is first
+
+    other = tracker.update([(300, 300, 50, 50)])[0]
+    assert other is not first
+    tracker.update([(300, 300, 50, 50)])
+    assert first not in tracker.tracks
+
+
+def test_track_keeps_best_crop_until_taken():
+    track = Track(1, (0, 0, 50, 50))
+    assert track.offer("low", 0.3)
+    assert track.offer("high", 0.9)
+    assert not track.offer("mid", 0.5)
+    assert track.take_best() == "high"
+    assert track.take_best() is None
+    assert track.offer("next", 0.1)
+
+
+def test_reset_starts_new_tracks():
+    tracker = FaceTracker()
+    first = tracker.update([(10, 10, 50, 50)])[0]
+    tracker.reset()
+    assert tracker.update([(10, 10, 50, 50)])[0] is not first
+
+
+# --- SESSIONS OVER STILL IMAGES ---
+def photo_session(model, faces_dir, independent_frames):
+    """RecognitionSession over the class folder's own photos, with a gallery of those same photos."""
+    detector = FaceDetector()
+    photos = sorted(os.listdir(faces_dir))
+    faces = [enrollment_face(cv2.imread(os.path.join(faces_dir, name)), detector) for name in photos]
+    gallery = Gallery.from_dict({identity_for(os.path.splitext(name)[0]): e
+                                 for name, e in zip(photos, embed_faces(model, faces))})
+    return RecognitionSession("B.Tech - ECE", "7", model, None, None, gallery, verbose=False,
+                              independent_frames=independent_frames)
+
+
+def recognize_folder(session, faces_dir):
+    source = ImageDirectorySource(faces_dir)
+    present = []
+    while True:
+        ok, frame = source.read()
+        if not ok:
+            return present
+        present.extend(session.recognize(frame)[2])
+
+
+def test_image_folder_marks_every_student(model, faces_dir):
+    """One photo per student: a single match has to be enough, and no votes carry over between photos."""
+    session = photo_session(model, faces_dir, independent_frames=True)
+    assert sorted(recognize_folder(session, faces_dir)) == ["22001008008", "22001008014", "22001008024"]
+
+
+def test_tracked_session_waits_for_a_second_vote(model, faces_dir):
+    # A live camera sees each face many times; one frame per person never confirms it
+    session = photo_session(model, faces_dir, independent_frames=False)
+    assert recognize_folder(session, faces_dir) == []
@@ -0,0 +1,130 @@
+from collections import Counter
+from itertools import count
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    inter = ix * iy
+    union = aw * ah + bw * bh - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    """One face followed across frames, with the identity votes from its embeddings."""
+
+    def __init__(self, track_id, box, min_votes=2, confirm_ratio=0.6, refresh_every=15):
+        self.id = track_id
+        self.box = box
+        self.votes = Counter()
+        self.observations = 0
+        self.last_distance = float("inf")
+        self.age = 0
+        self.missed = 0
+        self.since_embedding = 0
+        self.marked = False
+        # Best crop seen since the last embedding (see quality.FaceQuality)
+        self.best_face = None
+        self.best_quality = -1.0
+
+        self.min_votes = min_votes
+        self.confirm_ratio = confirm_ratio
+        self.refresh_every = refresh_every
+
+    @property
+    def identity(self):
+        """Majority identity once it has enough consistent votes, else None."""
+        if not self.votes:
+            return None
+        identity, n = self.votes.most_common(1)[0]
+        if identity is None or n < self.min_votes or n / self.observations < self.confirm_ratio:
+            return None
+        return identity
+
+    def needs_embedding(self):
+        # Unconfirmed tracks are embedded every cycle; confirmed ones only
+        # occasionally, to catch a box that drifted onto someone else
+        return self.identity is None or self.since_embedding >= self.refresh_every
+
+    def collecting(self, window):
+        """True while crops should be scored: whenever an embedding is due, or within window updates of a refresh."""
+        return self.identity is None or self.since_embedding >= self.refresh_every - window
+
+    def offer(self, face, quality):
+        """Keep face if it beats the best crop since the last embedding. Returns True if kept."""
+        if quality <= self.best_quality:
+            return False
+        self.best_face = face
+        self.best_quality = quality
+        return True
+
+    def take_best(self):
+        face = self.best_face
+        self.best_face = None
+        self.best_quality = -1.0
+        return face
+
+    def observe(self, identity, distance):
+        self.votes[identity] += 1
+        self.observations += 1
+        self.last_distance = distance
+        self.since_embedding = 0
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker over detector boxes.
+
+    update() associates the current boxes with existing tracks (highest IoU
+    first), starts tracks for unmatched boxes and drops tracks unseen for
+    more than max_missed updates.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_missed=3, min_votes=2, confirm_ratio=0.6, refresh_every=15):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.track_args = {"min_votes": min_votes, "confirm_ratio": confirm_ratio, "refresh_every": refresh_every}
+        self.tracks = []
+        self.ids = count(1)
+
+    def reset(self):
+        """Forget every track, e.g. before a frame unrelated to the last one."""
+        self.tracks = []
+
+    def update(self, boxes):
+        """Returns the Track for each box, in the same order."""
+        pairs = sorted(
+            ((iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+            reverse=True,
+        )
+
+        assigned = [None] * len(boxes)
+        used_tracks = set()
+        for overlap, t, b in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in used_tracks or assigned[b] is not None:
+                continue
+            used_tracks.add(t)
+            assigned[b] = self.tracks[t]
+
+        for t, track in enumerate(self.tracks):
+            if t in used_tracks:
+                track.missed = 0
+            else:
+                track.missed += 1
+
+        for b, box in enumerate(boxes):
+            if assigned[b] is None:
+                assigned[b] = Track(next(self.ids), box, **self.track_args)
+                self.tracks.append(assigned[b])
+            else:
+                assigned[b].box = box
+            assigned[b].age += 1
+            assigned[b].since_embedding += 1
+
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return assigned
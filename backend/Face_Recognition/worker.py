@@ -0,0 +1,428 @@
+"""
+Long-lived recognition worker.
+
+Loads the embedding model once and keeps it warm; attendance sessions for
+a course/semester are started and stopped over a small local HTTP API
+instead of launching face_rec.py (and reloading the model) per request.
+The backend (app.py) spawns this process on the first /start-attendance.
+
+Several classrooms can run at once, one camera each: every stream has its
+own gallery, detector and tracker, while face crops from all of them go
+through one InferenceBatcher and share model calls.
+
+Usage:
+    python worker.py [--host 127.0.0.1] [--port 8765]
+                     [--stream COURSE:SEMESTER[:SOURCE] ...]
+                     [--max-batch 32] [--batch-wait-ms 10] [--report-every 30]
+                     [--no-preview]
+
+HEADLESS=True marks a server deployment: the worker refuses to run, as
+face_rec.py does.
+
+Endpoints (JSON):
+    GET  /health          model state, uptime, attendance sync stats
+    GET  /sessions        all sessions with their pipeline stats
+    POST /sessions        {"course", "semester", "source"?}  start (idempotent)
+    POST /sessions/stop   {"course", "semester"}            stop
+"""
+import argparse
+import json
+import os
+import signal
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+from batcher import InferenceBatcher
+from embedding_cache import check_class
+from recognizer import (ANN_INDEX_PATH, BASE_DIR, RecognitionSession, draw_overlay, load_gallery, load_model,
+                        warm_up)
+from pipeline import RecognitionPipeline
+from sources import open_source
+from scheduler import MotionScheduler
+from roster import Roster
+from attendance_sync import AttendanceSync, make_session
+
+backend_url = os.getenv("BACKEND_URL")
+# Server deployments (no camera): attendance marking disabled, as in face_rec.py
+HEADLESS = os.environ.get("HEADLESS", "False") == "True"
+# Run sessions without cv2 preview windows (e.g. a camera box with no display)
+NO_PREVIEW = os.environ.get("FACE_NO_PREVIEW", "False") == "True"
+DEFAULT_SOURCE = os.environ.get("FACE_SOURCE", "0")
+
+
+class SourceBusy(Exception):
+    """The requested camera is already used by another class's session."""
+
+
+class WorkerSession:
+    """One course/semester: starting -> running -> stopped (or error)."""
+
+    def __init__(self, course, semester, source):
+        self.course = course
+        self.semester = semester
+        self.source_spec = source
+        self.state = "starting"
+        self.error = None
+        self.started_at = datetime.now()
+        self.stopped_at = None
+
+        self.pipeline = None
+        self.recognition = None
+        self.stop_requested = threading.Event()
+        self.done = threading.Event()
+
+    @property
+    def active(self):
+        return self.state in ("starting", "running")
+
+    @property
+    def title(self):
+        return f"Attendance System - {self.course} / {self.semester}"
+
+    def describe(self):
+        info = {
+            "course": self.course,
+            "semester": self.semester,
+            "source": self.source_spec,
+            "state": self.state,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "stopped_at": self.stopped_at.isoformat() if self.stopped_at else None,
+        }
+        if self.pipeline is not None:
+            info["pipeline"] = self.pipeline.stats()
+            info["recognition"] = self.recognition.stats()
+        return info
+
+
+class RecognitionWorker:
+    """
+    Owns the warm model (behind a shared InferenceBatcher), one pooled
+    backend session and one attendance journal, shared by every recognition
+    session it runs. Sessions are keyed by (course, semester); starting one
+    that is already active returns it unchanged.
+    """
+
+    def __init__(self, backend_url, journal_path, max_batch=32, batch_wait=0.01, report_every=30.0):
+        self.backend_url = backend_url
+        self.http = make_session()
+        self.attendance_sync = AttendanceSync(backend_url, journal_path, session=self.http)
+
+        self.model = None
+        self.model_error = None
+        self.model_ready = threading.Event()
+        self.model_seconds = None
+        self.max_batch = max_batch
+        self.batch_wait = batch_wait
+        self.batcher = None
+        self.report_every = report_every
+        self.stop_event = threading.Event()
+
+        self.sessions = {}
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+
+    def start(self):
+        self.attendance_sync.start()
+        threading.Thread(target=self._load_model, name="model-loader", daemon=True).start()
+        if self.report_every:
+            threading.Thread(target=self._report_loop, name="stats-report", daemon=True).start()
+        return self
+
+    def health(self):
+        return {
+            "status": "ok" if self.model_error is None else "error",
+            "model": "ready" if self.model is not None else ("error" if self.model_error else "loading"),
+            "model_error": self.model_error,
+            "model_load_s": self.model_seconds,
+            "uptime_s": time.monotonic() - self.started,
+            "active_sessions": sum(1 for s in self.list_sessions() if s.active),
+            "batcher": self.batcher.stats() if self.batcher is not None else None,
+            "attendance_sync": self.attendance_sync.stats(),
+        }
+
+    def list_sessions(self):
+        with self.lock:
+            return list(self.sessions.values())
+
+    def start_session(self, course, semester, source=None):
+        """Returns (session, created). Raises SourceBusy if another class holds the camera."""
+        source = source or DEFAULT_SOURCE
+        with self.lock:
+            current = self.sessions.get((course, semester))
+            if current is not None and current.active:
+                return current, False
+            for other in self.sessions.values():
+                if other.active and other.source_spec == source:
+                    raise SourceBusy(f"Source {source} is in use by {other.course} / {other.semester}")
+
+            session = WorkerSession(course, semester, source)
+            self.sessions[(course, semester)] = session
+
+        threading.Thread(target=self._run_session, args=(session,),
+                         name=f"session-{course}-{semester}", daemon=True).start()
+        return session, True
+
+    def stop_session(self, course, semester, timeout=10.0):
+        """Stop a session and wait for it to wind down. Returns it, or None if unknown."""
+        with self.lock:
+            session = self.sessions.get((course, semester))
+        if session is None:
+            return None
+        session.stop_requested.set()
+        session.done.wait(timeout)
+        return session
+
+    def shutdown(self):
+        self.stop_event.set()
+        for session in self.list_sessions():
+            session.stop_requested.set()
+        for session in self.list_sessions():
+            session.done.wait(10.0)
+        if self.batcher is not None:
+            self.batcher.stop()
+        remaining = self.attendance_sync.close()
+        if remaining:
+            print(f"⚠ {remaining} attendance mark(s) could not be sent; they stay journaled for the next run")
+
+    # --- BACKGROUND ---
+    def _load_model(self):
+        started = time.perf_counter()
+        try:
+            model = load_model()
+            built = time.perf_counter()
+            warm_up(model)
+            self.model = model
+            self.batcher = InferenceBatcher(model, self.max_batch, self.batch_wait).start()
+            self.model_seconds = time.perf_counter() - started
+            print(f"✔ Model ready in {self.model_seconds:.1f}s "
+                  f"(imports + build {built - started:.2f}s | first inference {time.perf_counter() - built:.2f}s)")
+        except Exception as e:
+            self.model_error = str(e)
+            print(f"❌ Could not load model: {e}")
+        self.model_ready.set()
+
+    def _run_session(self, session):
+        source = None
+        try:
+            self.model_ready.wait()
+            if self.model is None:
+                raise RuntimeError(f"model failed to load: {self.model_error}")
+
+            roster = Roster(self.backend_url, session.course, session.semester, session=self.http,
+                            campus=bool(ANN_INDEX_PATH))
+            roster.refresh()
+            gallery = load_gallery(session.course, session.semester, self.model)
+            if session.stop_requested.is_set():
+                raise InterruptedError("stopped before start")
+
+            source = open_source(session.source_spec)
+            recognition = RecognitionSession(session.course, session.semester, self.model, roster,
+                                             self.attendance_sync, gallery, source=source,
+                                             verbose=False, embed=self.batcher.embed)
+            pipeline = RecognitionPipeline(source, recognition.recognize, recognition.mark_attendance,
+                                           scheduler=MotionScheduler())
+            recognition.watch_gallery()
+            session.recognition = recognition
+            session.pipeline = pipeline.start()
+            session.state = "running"
+            print(f"✔ Attendance session started for {session.course} / {session.semester}")
+        except InterruptedError:
+            session.state = "stopped"
+        except Exception as e:
+            session.state = "error"
+            session.error = str(e)
+            print(f"❌ Could not start session for {session.course} / {session.semester}: {e}")
+
+        if session.state == "running":
+            # Runs until /sessions/stop or the source ends
+            while pipeline.running and not session.stop_requested.wait(0.5):
+                pass
+            pipeline.stop()
+            recognition.close()
+            session.state = "stopped"
+            print(f"Attendance session stopped for {session.course} / {session.semester}")
+            recognition.print_summary()
+
+        if source is not None:
+            source.release()
+        session.stopped_at = datetime.now()
+        session.done.set()
+
+    def _report_loop(self):
+        """Per-stream fps/latency and batcher utilisation, for sizing rooms per box."""
+        while not self.stop_event.wait(self.report_every):
+            running = [s for s in self.list_sessions() if s.state == "running"]
+            if not running:
+                continue
+            for session in running:
+                stats = session.pipeline.stats()
+                print(f"[{session.course} / {session.semester}] capture {stats['capture_fps']:.1f} fps, "
+                      f"recognition {stats['inference_fps']:.2f}/s every {stats['interval']:.1f}s, "
+                      f"latency p50 {stats['inference_p50_ms']:.0f} ms p95 {stats['inference_p95_ms']:.0f} ms, "
+                      f"dropped frames={stats['dropped_frames']}")
+                recognition = session.recognition.stats()
+                print(f"  quality gate skipped {recognition['quality_skipped']} embedding(s) "
+                      f"(~{recognition['quality_saved_ms'] / 1000:.1f}s), "
+                      f"{recognition['match_rate']:.0%} of {recognition['embedded']} embedded crop(s) matched")
+            batch = self.batcher.stats()
+            print(f"Batcher: {len(running)} stream(s), {batch['batches']} model call(s), "
+                  f"{batch['avg_batch_faces']:.1f} face(s) from {batch['avg_batch_requests']:.1f} stream(s) per call, "
+                  f"model {batch['avg_model_ms']:.0f} ms, wait {batch['avg_wait_ms']:.1f} ms")
+
+
+# --- HTTP API ---
+def make_handler(worker):
+    class Handler(BaseHTTPRequestHandler):
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _read_json(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                return json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return None
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send_json(200, worker.health())
+            elif self.path == "/sessions":
+                self._send_json(200, [s.describe() for s in worker.list_sessions()])
+            else:
+                self._send_json(404, {"status": "error", "message": "Not found"})
+
+        def do_POST(self):
+            body = self._read_json()
+            if not isinstance(body, dict) or not body.get("course") or not body.get("semester"):
+                self._send_json(400, {"status": "error", "message": "course and semester are required"})
+                return
+            course, semester = str(body["course"]), str(body["semester"])
+            try:
+                check_class(course, semester)
+            except ValueError as e:
+                self._send_json(400, {"status": "error", "message": str(e)})
+                return
+
+            if self.path == "/sessions":
+                try:
+                    session, created = worker.start_session(course, semester, body.get("source"))
+                except SourceBusy as e:
+                    self._send_json(409, {"status": "error", "message": str(e)})
+                    return
+                self._send_json(200, {
+                    "status": "started" if created else "already_running",
+                    "message": "Attendance system launched" if created else "Attendance is already running for this class",
+                    "session": session.describe(),
+                })
+            elif self.path == "/sessions/stop":
+                session = worker.stop_session(course, semester)
+                if session is None:
+                    self._send_json(404, {"status": "error", "message": "No attendance session for this class"})
+                    return
+                self._send_json(200, {"status": session.state, "session": session.describe()})
+            else:
+                self._send_json(404, {"status": "error", "message": "Not found"})
+
+        def log_request(self, code="-", size="-"):
+            # Keep the console for recognition output; only log failed requests
+            if isinstance(code, int) and code >= 400:
+                super().log_request(code, size)
+
+    return Handler
+
+
+# --- PREVIEW (cv2 windows must stay on the main thread) ---
+def display_loop(worker, stop_event):
+    shown = {}
+    while not stop_event.is_set():
+        open_windows = set(shown)
+        for session in worker.list_sessions():
+            if session.state != "running":
+                continue
+            open_windows.discard(session.title)
+            seq, frame = session.pipeline.latest_frame()
+            if frame is None or shown.get(session.title) == seq:
+                continue
+            shown[session.title] = seq
+
+            frame = frame.copy()
+            labels, status = session.pipeline.result()
+            stats = session.pipeline.stats()
+            draw_overlay(frame, labels, status,
+                         f"capture {stats['capture_fps']:.0f} fps | infer p50 {stats['inference_p50_ms']:.0f} ms "
+                         f"p95 {stats['inference_p95_ms']:.0f} ms every {stats['interval']:.1f}s")
+            cv2.imshow(session.title, frame)
+
+        for title in open_windows:
+            cv2.destroyWindow(title)
+            del shown[title]
+
+        if not shown:
+            stop_event.wait(0.1)
+        elif cv2.waitKey(1) == 27:  # ESC key stops every previewed session
+            for session in worker.list_sessions():
+                session.stop_requested.set()
+    cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-lived face recognition worker.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("RECOGNITION_WORKER_PORT", 8765)))
+    parser.add_argument("--stream", action="append", default=[], metavar="COURSE:SEMESTER[:SOURCE]",
+                        help="start a session at boot; repeat for several cameras")
+    parser.add_argument("--max-batch", type=int, default=32,
+                        help="most faces per shared model call (default: 32)")
+    parser.add_argument("--batch-wait-ms", type=float, default=10.0,
+                        help="how long a model call waits for other streams' faces (default: 10)")
+    parser.add_argument("--report-every", type=float, default=30.0,
+                        help="seconds between per-stream stats lines, 0 to disable (default: 30)")
+    parser.add_argument("--no-preview", action="store_true", default=NO_PREVIEW,
+                        help="no cv2 preview windows (default: FACE_NO_PREVIEW)")
+    args = parser.parse_args()
+
+    if HEADLESS:
+        print("Running in server mode: attendance marking disabled.")
+        return
+
+    worker = RecognitionWorker(backend_url, os.path.join(BASE_DIR, "attendance_journal.sqlite3"),
+                               max_batch=args.max_batch, batch_wait=args.batch_wait_ms / 1000,
+                               report_every=args.report_every).start()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(worker))
+    threading.Thread(target=server.serve_forever, name="http", daemon=True).start()
+    print(f"Recognition worker listening on http://{args.host}:{args.port}")
+
+    for spec in args.stream:
+        course, semester, *source = spec.split(":", 2)
+        try:
+            worker.start_session(course, semester, source[0] if source else None)
+        except SourceBusy as e:
+            print(f"❌ {e}")
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    try:
+        if args.no_preview:
+            stop_event.wait()
+        else:
+            display_loop(worker, stop_event)
+    except KeyboardInterrupt:
+        pass
+
+    print("Shutting down recognition worker...")
+    server.shutdown()
+    worker.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, Depends, HTTPException, File, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, File, Form, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from database.database import get_db
 from database.models import (
     User,
@@ -10,6 +12,7 @@ from database.models import (
     Schedule,
     Announcement,
     Attendance,
+    FaceEmbedding,
     LeaveRequest,
     Assignment,
     StudentMarks,
@@ -24,6 +27,13 @@ import bcrypt
 import subprocess
 import sys
 import os
+import threading
+import time
+import asyncio
+import hashlib
+import requests
+from urllib.parse import urlparse
+import numpy as np
 import pandas as pd
 import io
 from PIL import Image
@@ -31,6 +41,7 @@ import pytesseract
 from typing import List, Optional
 from dotenv import load_dotenv
 from routers.admin_routes import router as admin_router
+from attendance_utils import attendance_day, attendance_instant, decode_attendance_cursor, encode_attendance_cursor
 import re
 import pdfplumber
 
@@ -58,6 +69,12 @@ app.include_router(admin_router)
 
 load_dotenv()
 backend_url = os.getenv("BACKEND_URL")
+# Long-lived recognition worker (Face_Recognition/worker.py), started on demand
+RECOGNITION_WORKER_URL = os.getenv("RECOGNITION_WORKER_URL", "http://127.0.0.1:8765")
+# Server mode: no camera here, so camera attendance sessions are refused
+HEADLESS = os.getenv("HEADLESS", "False") == "True"
+# Frames accepted per POST /recognize request
+MAX_RECOGNIZE_FRAMES = int(os.getenv("RECOGNIZE_MAX_FRAMES", 16))
 
 
 # ---------------------------
@@ -96,12 +113,20 @@ class UserUpdate(BaseModel):
 class AttendanceStartRequest(BaseModel):
     course: str
     semester: str
+    source: Optional[str] = None
+
+
+class AttendanceStopRequest(BaseModel):
+    course: str
+    semester: str
 
 
 class AttendanceCreate(BaseModel):
     student_id: int
     class_id: int
     status: str = "present"
+    # When the mark was taken (e.g. replayed from a recognizer's offline journal)
+    marked_at: datetime | None = None
 
 
 # Answer-key Pydantic models
@@ -204,63 +229,144 @@ def home():
 
 
 # ---------------------------
-# START ATTENDANCE
+# RECOGNITION WORKER
 # ---------------------------
-@app.post("/start-attendance")
-def start_attendance(payload: AttendanceStartRequest):
+recognition_worker = None  # Popen handle when this process launched the worker
+# Sync handlers run in a threadpool: concurrent /start-attendance calls must not spawn two workers
+recognition_worker_lock = threading.Lock()
+
+
+def worker_alive() -> bool:
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        script_path = os.path.join(base_dir, "Face_Recognition", "face_rec.py")
+        return requests.get(f"{RECOGNITION_WORKER_URL}/health", timeout=1).status_code == 200
+    except requests.RequestException:
+        return False
+
+
+class RecognitionDisabled(RuntimeError):
+    """Camera attendance is off on this deployment (HEADLESS=True)."""
 
+
+def ensure_worker(timeout: float = 30.0):
+    """Start the recognition worker unless one already answers /health."""
+    if HEADLESS:
+        raise RecognitionDisabled("Running in server mode: attendance marking disabled.")
+    # The check, the spawn and the wait happen under one lock, so a second
+    # request waits for the first one's worker instead of starting another
+    with recognition_worker_lock:
+        _ensure_worker(timeout)
+
+
+def _ensure_worker(timeout):
+    global recognition_worker
+    if worker_alive():
+        return
+
+    if recognition_worker is None or recognition_worker.poll() is not None:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        script_path = os.path.join(base_dir, "Face_Recognition", "worker.py")
         if not os.path.exists(script_path):
             raise FileNotFoundError(f"Could not find: {script_path}")
 
-        python_executable = sys.executable
+        port = urlparse(RECOGNITION_WORKER_URL).port or 8765
+        print(f"Starting recognition worker: {script_path} (port {port})")
+        recognition_worker = subprocess.Popen([sys.executable, script_path, "--port", str(port)])
 
-        print(f"Running: {script_path}")
-        print(f"Python path: {python_executable}")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if recognition_worker.poll() is not None:
+            raise RuntimeError(f"Recognition worker exited with code {recognition_worker.returncode}")
+        if worker_alive():
+            return
+        time.sleep(0.2)
+    raise TimeoutError("Recognition worker did not come up in time")
 
-        subprocess.Popen([python_executable, script_path, payload.course, payload.semester])
-        return JSONResponse(content={"status": "started", "message": "Attendance system launched"})
 
+# ---------------------------
+# START / STOP ATTENDANCE
+# ---------------------------
+@app.post("/start-attendance")
+def start_attendance(payload: AttendanceStartRequest):
+    """Idempotent: a class that is already running is reported, not launched twice."""
+    try:
+        ensure_worker()
+        res = requests.post(
+            f"{RECOGNITION_WORKER_URL}/sessions",
+            json=payload.model_dump(exclude_none=True),
+            timeout=10,
+        )
+        return JSONResponse(content=res.json(), status_code=res.status_code)
+
+    except RecognitionDisabled as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=503)
     except Exception as e:
         return JSONResponse(content={"status": "error", "message": str(e)}, status_code=500)
 
 
+@app.post("/stop-attendance")
+def stop_attendance(payload: AttendanceStopRequest):
+    if not worker_alive():
+        return JSONResponse(content={"status": "error", "message": "Attendance system is not running"}, status_code=404)
+    try:
+        res = requests.post(f"{RECOGNITION_WORKER_URL}/sessions/stop", json=payload.model_dump(), timeout=15)
+        return JSONResponse(content=res.json(), status_code=res.status_code)
+    except requests.RequestException as e:
+        return JSONResponse(content={"status": "error", "message": str(e)}, status_code=502)
+
+
+@app.get("/attendance-sessions")
+def attendance_sessions():
+    """Sessions known to the recognition worker, with their live stats ([] if it isn't running)."""
+    try:
+        res = requests.get(f"{RECOGNITION_WORKER_URL}/sessions", timeout=5)
+    except requests.RequestException:
+        return []
+    return JSONResponse(content=res.json(), status_code=res.status_code)
+
+
 # ---------------------------
 # MARK ATTENDANCE
 # ---------------------------
+ATTENDANCE_UNIQUE_KEY = ["student_id", "class_id", "attendance_date"]
+
+
+def attendance_row(data: AttendanceCreate) -> dict:
+    """Insert values for one mark; the attendance day is its date in ATTENDANCE_TIMEZONE (see attendance_utils)."""
+    marked_at = attendance_instant(data.marked_at)
+    return {
+        "student_id": data.student_id,
+        "class_id": data.class_id,
+        "status": data.status,
+        "marked_at": marked_at,
+        "attendance_date": attendance_day(marked_at),
+    }
+
+
 @app.post("/attendance")
 def mark_attendance(data: AttendanceCreate, db: Session = Depends(get_db)):
     try:
-        today = date.today()
-
-        existing_entry = (
-            db.query(Attendance)
-            .filter(
-                Attendance.student_id == data.student_id,
-                Attendance.class_id == data.class_id,
-                func.date(Attendance.marked_at) == today,
+        # The unique (student_id, class_id, attendance_date) constraint does the
+        # duplicate check, atomically, in the same indexed statement
+        entry = db.execute(
+            pg_insert(Attendance)
+            .values(**attendance_row(data))
+            .on_conflict_do_nothing(index_elements=ATTENDANCE_UNIQUE_KEY)
+            .returning(
+                Attendance.id,
+                Attendance.student_id,
+                Attendance.class_id,
+                Attendance.status,
+                Attendance.marked_at,
             )
-            .first()
-        )
+        ).first()
+        db.commit()
 
-        if existing_entry:
+        if entry is None:
             return {
                 "success": False,
                 "message": "Attendance already marked for this student in this class today.",
             }
 
-        entry = Attendance(
-            student_id=data.student_id,
-            class_id=data.class_id,
-            status=data.status,
-        )
-
-        db.add(entry)
-        db.commit()
-        db.refresh(entry)
-
         return {
             "success": True,
             "entry": {
@@ -278,24 +384,383 @@ def mark_attendance(data: AttendanceCreate, db: Session = Depends(get_db)):
 
 
 # ---------------------------
-# GET ATTENDANCE
+# MARK ATTENDANCE (BULK)
 # ---------------------------
-@app.get("/attendance")
-def get_attendance(db: Session = Depends(get_db)):
-    records = db.query(Attendance).order_by(Attendance.marked_at.desc()).all()
+@app.post("/attendance/bulk")
+def mark_attendance_bulk(items: List[AttendanceCreate], db: Session = Depends(get_db)):
+    """
+    Mark a whole room in one transaction: a single multi-row INSERT ... ON
+    CONFLICT DO NOTHING against the daily unique constraint (repeats within
+    the batch are skipped the same way). Each item comes back as "created"
+    or "duplicate".
+    """
+    if not items:
+        return {"success": True, "created": 0, "duplicates": 0, "results": []}
 
-    return [
+    rows = [attendance_row(item) for item in items]
+    try:
+        created = db.execute(
+            pg_insert(Attendance)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=ATTENDANCE_UNIQUE_KEY)
+            .returning(
+                Attendance.id,
+                Attendance.student_id,
+                Attendance.class_id,
+                Attendance.attendance_date,
+                Attendance.marked_at,
+            )
+        ).all()
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    created_by_key = {(r.student_id, r.class_id, r.attendance_date): r for r in created}
+    results = []
+    for item, row_values in zip(items, rows):
+        row = created_by_key.pop((item.student_id, item.class_id, row_values["attendance_date"]), None)
+        result = {"student_id": item.student_id, "class_id": item.class_id}
+        if row is not None:
+            result.update({"result": "created", "id": row.id, "marked_at": row.marked_at})
+        else:
+            result["result"] = "duplicate"
+        results.append(result)
+
+    return {
+        "success": True,
+        "created": len(created),
+        "duplicates": len(items) - len(created),
+        "results": results,
+    }
+
+
+# ---------------------------
+# RECOGNIZE UPLOADED FRAMES
+# ---------------------------
+# Face_Recognition's modules import each other by flat name (embedder, recognize_pool, ...);
+# put the folder on sys.path now so any handler can import them lazily, pool started or not
+FACE_RECOGNITION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Face_Recognition")
+if FACE_RECOGNITION_DIR not in sys.path:
+    sys.path.insert(0, FACE_RECOGNITION_DIR)
+
+recognition_pool = None  # Face_Recognition/recognize_pool.RecognitionPool, started on first use
+
+
+def get_recognition_pool():
+    global recognition_pool
+    if recognition_pool is None:
+        from recognize_pool import RecognitionPool
+
+        recognition_pool = RecognitionPool().start()
+    return recognition_pool
+
+
+@app.post("/recognize")
+async def recognize_frames(
+    course: str = Form(...),
+    semester: str = Form(...),
+    frames: List[UploadFile] = File(...),
+    mark: bool = Form(False),
+    class_id: int = Form(1),
+    db: Session = Depends(get_db),
+):
+    """
+    Recognize the faces in one or more JPEG frames, e.g. from a teacher's
+    laptop camera. Returns the matches of each frame and the request's
+    latency breakdown; with mark=true, recognized students are also marked
+    present through the bulk attendance insert. 429 when the pool is full.
+    """
+    if len(frames) > MAX_RECOGNIZE_FRAMES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_RECOGNIZE_FRAMES} frames per request")
+
+    started = time.perf_counter()
+    # Raw bytes go to the pool as they are; the pool process decodes them in place
+    data = [await frame.read() for frame in frames]
+
+    pool = get_recognition_pool()
+    from recognize_pool import InvalidClass, PoolBusy, UnknownClass
+
+    submitted = time.perf_counter()
+    try:
+        future = pool.submit(course, str(semester), data)
+    except PoolBusy as e:
+        return JSONResponse(content={"status": "busy", "message": str(e)}, status_code=429, headers={"Retry-After": "1"})
+    except InvalidClass as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UnknownClass as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        result = await asyncio.wrap_future(future)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Recognition failed: {e}")
+    recognized = time.perf_counter()
+
+    # Database work is blocking: keep it off the event loop
+    marked = await run_in_threadpool(mark_recognized, result, class_id, db) if mark else None
+
+    timings = result["timings"]
+    # Waiting for a free process and moving the frames to it and back
+    timings["queue_ms"] = max(0.0, (recognized - submitted) * 1000 - sum(timings.values()))
+    timings["upload_ms"] = (submitted - started) * 1000
+    timings["mark_ms"] = (time.perf_counter() - recognized) * 1000 if mark else 0.0
+    timings["total_ms"] = (time.perf_counter() - started) * 1000
+
+    return {
+        "course": course,
+        "semester": semester,
+        "frames": result["frames"],
+        "faces": result["faces"],
+        "embedded": result["embedded"],
+        "marked": marked,
+        "timings": {k: round(v, 2) for k, v in timings.items()},
+    }
+
+
+def mark_recognized(result, class_id: int, db: Session):
+    """Mark present every student /recognize matched by roll number."""
+    roll_numbers = {
+        face["roll_number"] for frame in result["frames"] for face in frame["faces"] if face["roll_number"]
+    }
+    students = db.query(User.id).filter(User.roll_number.in_(roll_numbers)).all() if roll_numbers else []
+    return mark_attendance_bulk(
+        [AttendanceCreate(student_id=student.id, class_id=class_id) for student in students], db
+    )
+
+
+@app.get("/recognize/stats")
+def recognize_stats():
+    """Pool size, queue depth, 429 count and latency percentiles of POST /recognize."""
+    if recognition_pool is None:
+        return {"running": False}
+    return {"running": True, **recognition_pool.stats()}
+
+
+# ---------------------------
+# FACE EMBEDDINGS (ENROLL / EXPORT)
+# ---------------------------
+def stored_embedding_hashes(user_id: int, model_name: str, hashes: List[str], db: Session):
+    """Which of these photo hashes the user already has embeddings for. 404 for an unknown user."""
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return {
+        h for (h,) in db.query(FaceEmbedding.source_hash).filter(
+            FaceEmbedding.user_id == user_id,
+            FaceEmbedding.model_name == model_name,
+            FaceEmbedding.source_hash.in_(hashes),
+        )
+    }
+
+
+def insert_face_embeddings(rows, db: Session):
+    """Insert embedding rows, skipping ones already stored. Returns the source hashes inserted."""
+    try:
+        created = {
+            r.source_hash for r in db.execute(
+                pg_insert(FaceEmbedding)
+                .values(rows)
+                .on_conflict_do_nothing(constraint="uq_face_embedding_user_model_source")
+                .returning(FaceEmbedding.source_hash)
+            )
+        }
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+    return created
+
+
+@app.post("/face-embeddings/enroll")
+async def enroll_face_embeddings(
+    user_id: int = Form(...),
+    photos: List[UploadFile] = File(...),
+    db: Session = Depends(get_db),
+):
+    """
+    Embed a student's photos once, at upload, and store the vectors.
+    Photos already stored for this student and model (same sha256) are not
+    embedded again. Each photo comes back as "created", "duplicate" or
+    "no_face".
+    """
+    data = [await photo.read() for photo in photos]
+    hashes = [hashlib.sha256(d).hexdigest() for d in data]
+
+    from embedder import backend_name
+    from recognize_pool import PoolBusy
+
+    model_name = backend_name()
+    # Database work is blocking: keep it off the event loop
+    stored = await run_in_threadpool(stored_embedding_hashes, user_id, model_name, hashes, db)
+    pool = get_recognition_pool()
+    todo = [i for i, h in enumerate(hashes) if h not in stored and h not in hashes[:i]]
+
+    embeddings = {}
+    if todo:
+        try:
+            future = pool.embed_photos([data[i] for i in todo])
+        except PoolBusy as e:
+            return JSONResponse(content={"status": "busy", "message": str(e)}, status_code=429, headers={"Retry-After": "1"})
+        try:
+            result = await asyncio.wrap_future(future)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Embedding failed: {e}")
+        model_name = result["model"]
+        embeddings = {i: e for i, e in zip(todo, result["embeddings"]) if e is not None}
+
+    rows = [
         {
-            "id": r.id,
-            "student_id": r.student_id,
-            "class_id": r.class_id,
-            "status": r.status,
-            "marked_at": r.marked_at,
-            "student_name": r.student.full_name if r.student else None,
-            "class_name": r.class_.name if r.class_ else None,
+            "user_id": user_id,
+            "model_name": model_name,
+            "dim": len(embedding),
+            "vector": np.asarray(embedding, dtype="<f4").tobytes(),
+            "source_hash": hashes[i],
         }
-        for r in records
+        for i, embedding in embeddings.items()
     ]
+    created = await run_in_threadpool(insert_face_embeddings, rows, db) if rows else set()
+
+    results = []
+    for i, photo in enumerate(photos):
+        if i in embeddings and hashes[i] in created:
+            result = "created"
+            created.discard(hashes[i])
+        elif i in todo and i not in embeddings:
+            result = "no_face"
+        else:
+            result = "duplicate"
+        results.append({"filename": photo.filename, "sha256": hashes[i], "result": result})
+
+    return {
+        "success": True,
+        "user_id": user_id,
+        "model": model_name,
+        "created": sum(r["result"] == "created" for r in results),
+        "results": results,
+    }
+
+
+@app.get("/face-embeddings/export")
+def export_face_embeddings(course: str, semester: str, model: str = "Facenet", db: Session = Depends(get_db)):
+    """
+    A class's whole gallery as one binary blob: two .npy arrays back to
+    back, the (N, D) float32 embeddings and then their N labels
+    ("Name(roll number)", one per embedding). Load both with np.load on
+    the same stream (see recognizer.fetch_gallery).
+    """
+    rows = (
+        db.query(FaceEmbedding.vector, FaceEmbedding.dim, User.full_name, User.roll_number)
+        .join(User, FaceEmbedding.user_id == User.id)
+        .filter(FaceEmbedding.model_name == model, User.course == course, User.semester == str(semester))
+        .order_by(FaceEmbedding.user_id, FaceEmbedding.id)
+        .all()
+    )
+    dims = {r.dim for r in rows}
+    if len(dims) > 1:
+        raise HTTPException(status_code=409, detail=f"Mixed embedding sizes {sorted(dims)} for model {model}")
+
+    dim = dims.pop() if dims else 0
+    # Stored vectors are raw float32: join them and view as a matrix, no per-value parsing
+    matrix = np.frombuffer(b"".join(r.vector for r in rows), dtype="<f4").reshape(len(rows), dim)
+    labels = np.array([f"{r.full_name}({r.roll_number})" if r.roll_number else r.full_name for r in rows], dtype=str)
+
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    np.save(buffer, labels)
+    return Response(
+        content=buffer.getvalue(),
+        media_type="application/octet-stream",
+        headers={
+            "Content-Disposition": f'attachment; filename="gallery-{model}.npy"',
+            "X-Embedding-Count": str(len(rows)),
+            "X-Embedding-Dim": str(dim),
+        },
+    )
+
+
+# ---------------------------
+# GET ATTENDANCE
+# ---------------------------
+ATTENDANCE_PAGE_MAX = 500
+
+
+@app.get("/attendance")
+def get_attendance(
+    limit: int = 100,
+    cursor: str | None = None,
+    student_id: int | None = None,
+    class_id: int | None = None,
+    course: str | None = None,
+    semester: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Attendance marks, newest first, one page at a time. Pass next_cursor
+    back as cursor for the next page: it is a keyset on (marked_at, id), so
+    a deep page costs the same as the first (marked_at is NOT NULL;
+    database/migrate_attendance_date.py backfills older rows). Student and class names come
+    from the same query through joins, not one lazy load per row. course /
+    semester filter on the student; date_from / date_to on the attendance day.
+    """
+    limit = max(1, min(limit, ATTENDANCE_PAGE_MAX))
+    query = (
+        db.query(
+            Attendance.id,
+            Attendance.student_id,
+            Attendance.class_id,
+            Attendance.status,
+            Attendance.marked_at,
+            Attendance.attendance_date,
+            User.full_name.label("student_name"),
+            Class.name.label("class_name"),
+        )
+        .outerjoin(User, Attendance.student_id == User.id)
+        .outerjoin(Class, Attendance.class_id == Class.id)
+    )
+    if student_id is not None:
+        query = query.filter(Attendance.student_id == student_id)
+    if class_id is not None:
+        query = query.filter(Attendance.class_id == class_id)
+    if course:
+        query = query.filter(User.course == course)
+    if semester:
+        query = query.filter(User.semester == str(semester))
+    if date_from:
+        query = query.filter(Attendance.attendance_date >= date_from)
+    if date_to:
+        query = query.filter(Attendance.attendance_date <= date_to)
+    if cursor:
+        try:
+            marked_at, row_id = decode_attendance_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(Attendance.marked_at, Attendance.id) < tuple_(marked_at, row_id))
+
+    # One extra row tells whether there is a next page
+    rows = query.order_by(Attendance.marked_at.desc(), Attendance.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    return {
+        "items": [
+            {
+                "id": r.id,
+                "student_id": r.student_id,
+                "class_id": r.class_id,
+                "status": r.status,
+                "marked_at": r.marked_at,
+                "attendance_date": r.attendance_date,
+                "student_name": r.student_name,
+                "class_name": r.class_name,
+            }
+            for r in rows
+        ],
+        "next_cursor": encode_attendance_cursor(rows[-1].marked_at, rows[-1].id) if has_more else None,
+    }
 
 
 # ---------------------------
@@ -309,6 +774,33 @@ def get_student(roll_num: str, db: Session = Depends(get_db)):
     return {"id": user.id, "name": user.full_name}
 
 
+# ---------------------------
+# ROSTER (roll number -> student) FOR RECOGNIZERS
+# ---------------------------
+@app.get("/roster")
+def get_roster(
+    course: str | None = None, semester: str | None = None, db: Session = Depends(get_db)
+):
+    """
+    All students of a course/semester keyed by roll number, in one response,
+    so a recognizer can resolve matches locally instead of calling
+    /getstudent/rollnum once per recognized face.
+    """
+    query = db.query(User.id, User.full_name, User.roll_number).filter(
+        User.role == "Student",
+        User.roll_number.isnot(None),
+    )
+    if course:
+        query = query.filter(User.course == course)
+    if semester:
+        query = query.filter(User.semester == str(semester))
+
+    return {
+        roll_number: {"id": user_id, "name": full_name}
+        for user_id, full_name, roll_number in query.all()
+    }
+
+
 # ---------------------------
 # REGISTER
     # # ---------------------------
@@ -0,0 +1,47 @@
+# attendance_utils.py
+#
+# Pure helpers behind the attendance endpoints in app.py, kept free of
+# FastAPI and the database so they can be tested on their own.
+import base64
+import os
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+# The zone an attendance day is counted in: by the API when it marks, and by
+# database/migrate_attendance_date.py when it backfills. Neither the database
+# session's zone nor the API host's local zone is used.
+ATTENDANCE_TIMEZONE = os.environ.get("ATTENDANCE_TIMEZONE", "Asia/Kolkata")
+ATTENDANCE_TZ = ZoneInfo(ATTENDANCE_TIMEZONE)  # fails at startup on an unknown zone name
+
+
+def attendance_instant(marked_at: datetime | None = None) -> datetime:
+    """Timezone-aware time of a mark: now if None; a naive time is taken as wall time in ATTENDANCE_TIMEZONE."""
+    if marked_at is None:
+        return datetime.now(timezone.utc)
+    if marked_at.tzinfo is None:
+        return marked_at.replace(tzinfo=ATTENDANCE_TZ)
+    return marked_at
+
+
+def attendance_day(marked_at: datetime | None = None) -> date:
+    """The day a mark counts for (the daily unique key), in ATTENDANCE_TIMEZONE."""
+    return attendance_instant(marked_at).astimezone(ATTENDANCE_TZ).date()
+
+
+def attendance_day_sql(column: str) -> str:
+    """Postgres expression for attendance_day() of a timestamptz column or expression."""
+    return f"(({column}) AT TIME ZONE '{ATTENDANCE_TZ.key}')::date"
+
+
+def encode_attendance_cursor(marked_at: datetime, row_id: int) -> str:
+    """Opaque GET /attendance page cursor: the (marked_at, id) keyset of the last row returned."""
+    return base64.urlsafe_b64encode(f"{marked_at.isoformat()}|{row_id}".encode()).decode()
+
+
+def decode_attendance_cursor(cursor: str):
+    """(marked_at, id) from a cursor. Raises ValueError if it wasn't made by encode_attendance_cursor."""
+    try:
+        marked_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(marked_at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
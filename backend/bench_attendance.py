@@ -0,0 +1,63 @@
+"""
+Benchmark: per-row POST /attendance vs POST /attendance/bulk against the real database.
+
+Each variant runs inside an outer transaction that is rolled back at the
+end (endpoint commits become savepoint releases), so nothing is left in
+the attendance table and both variants start from the same state.
+
+Usage (from backend/):
+    python bench_attendance.py [--students 60] [--class-id 1]
+"""
+import argparse
+import time
+
+from sqlalchemy.orm import Session
+
+from app import AttendanceCreate, mark_attendance, mark_attendance_bulk
+from database.database import engine
+from database.models import Class, User
+
+
+def run_isolated(fn):
+    with engine.connect() as conn:
+        outer = conn.begin()
+        db = Session(bind=conn, join_transaction_mode="create_savepoint")
+        try:
+            started = time.perf_counter()
+            result = fn(db)
+            return (time.perf_counter() - started) * 1000, result
+        finally:
+            db.close()
+            outer.rollback()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=60)
+    parser.add_argument("--class-id", type=int, default=None)
+    args = parser.parse_args()
+
+    with Session(engine) as db:
+        student_ids = [
+            row.id for row in db.query(User.id).filter(User.role == "Student").limit(args.students)
+        ]
+        class_id = args.class_id or db.query(Class.id).order_by(Class.id).limit(1).scalar()
+
+    if not student_ids or class_id is None:
+        print("❌ Need at least one student and one class in the database to benchmark.")
+        return
+
+    items = [AttendanceCreate(student_id=sid, class_id=class_id) for sid in student_ids]
+    print(f"Marking {len(items)} student(s) in class {class_id}")
+
+    per_row_ms, _ = run_isolated(lambda db: [mark_attendance(item, db) for item in items])
+    bulk_ms, bulk = run_isolated(lambda db: mark_attendance_bulk(items, db))
+
+    print(f"per-row POST /attendance     : {per_row_ms:8.1f} ms ({per_row_ms / len(items):.2f} ms/student)")
+    print(f"POST /attendance/bulk        : {bulk_ms:8.1f} ms ({bulk_ms / len(items):.2f} ms/student)")
+    print(f"speedup                      : {per_row_ms / bulk_ms:8.1f}x  "
+          f"(bulk created {bulk['created']}, duplicates {bulk['duplicates']})")
+
+
+if __name__ == "__main__":
+    main()
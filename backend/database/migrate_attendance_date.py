@@ -0,0 +1,81 @@
+# database/migrate_attendance_date.py
+#
+# Adds attendance.attendance_date, the (student_id, class_id, attendance_date)
+# unique constraint and the indexes GET /attendance pages with to an existing
+# database, and makes marked_at NOT NULL (the page cursor is built from it).
+# Safe to run more than once.
+#
+#   cd backend && python -m database.migrate_attendance_date
+from sqlalchemy import text
+
+from attendance_utils import ATTENDANCE_TZ, attendance_day_sql
+
+from .database import engine
+
+# Days are counted in ATTENDANCE_TIMEZONE (as app.py does), not the database session's zone
+TODAY = attendance_day_sql("now()")
+
+STEPS = [
+    (
+        "Adding attendance_date column",
+        "ALTER TABLE attendance ADD COLUMN IF NOT EXISTS attendance_date DATE",
+    ),
+    (
+        "Backfilling attendance_date from marked_at",
+        f"UPDATE attendance SET attendance_date = COALESCE({attendance_day_sql('marked_at')}, {TODAY}) "
+        "WHERE attendance_date IS NULL",
+    ),
+    (
+        # Rows from before marked_at had a server default: start of their day
+        "Backfilling marked_at from attendance_date",
+        f"UPDATE attendance SET marked_at = attendance_date::timestamp AT TIME ZONE '{ATTENDANCE_TZ.key}' "
+        "WHERE marked_at IS NULL",
+    ),
+    (
+        "Setting marked_at NOT NULL",
+        "ALTER TABLE attendance ALTER COLUMN marked_at SET DEFAULT now(), "
+        "ALTER COLUMN marked_at SET NOT NULL",
+    ),
+    (
+        # Keep the earliest mark of each student/class/day
+        "Removing same-day duplicate marks",
+        "DELETE FROM attendance a USING attendance b "
+        "WHERE a.student_id = b.student_id AND a.class_id = b.class_id "
+        "AND a.attendance_date = b.attendance_date AND a.id > b.id",
+    ),
+    (
+        "Setting default and NOT NULL",
+        f"ALTER TABLE attendance ALTER COLUMN attendance_date SET DEFAULT {TODAY}, "
+        "ALTER COLUMN attendance_date SET NOT NULL",
+    ),
+    (
+        "Adding unique constraint",
+        """
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM pg_constraint WHERE conname = 'uq_attendance_student_class_date'
+            ) THEN
+                ALTER TABLE attendance ADD CONSTRAINT uq_attendance_student_class_date
+                    UNIQUE (student_id, class_id, attendance_date);
+            END IF;
+        END $$
+        """,
+    ),
+    (
+        "Adding (marked_at, id) index for keyset pagination",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_marked_at_id ON attendance (marked_at, id)",
+    ),
+    (
+        "Adding (class_id, attendance_date) index",
+        "CREATE INDEX IF NOT EXISTS ix_attendance_class_date ON attendance (class_id, attendance_date)",
+    ),
+]
+
+print("Migrating attendance table...")
+with engine.begin() as conn:
+    for label, sql in STEPS:
+        result = conn.execute(text(sql))
+        suffix = f" ({result.rowcount} row(s))" if result.rowcount and result.rowcount > 0 else ""
+        print(f"- {label}{suffix}")
+print("Migration complete.")
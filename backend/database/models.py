@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, DateTime, Text, text, Date, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, TIMESTAMP, DateTime, Text, text, Date, Float, UniqueConstraint, LargeBinary, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
+from attendance_utils import attendance_day_sql
 from sqlalchemy.dialects.postgresql import JSONB  
 
 
@@ -29,6 +30,7 @@ class User(Base):
     # Relationships
     classes = relationship("Class", back_populates="teacher")
     attendance_records = relationship("Attendance", back_populates="student")
+    face_embeddings = relationship("FaceEmbedding", back_populates="user", cascade="all, delete-orphan")
 
 
 # ---------------------
@@ -52,17 +54,47 @@ class Class(Base):
 # ---------------------
 class Attendance(Base):
     __tablename__ = "attendance"
+    # One mark per student per class per day; existing tables are migrated
+    # by database/migrate_attendance_date.py
+    __table_args__ = (
+        UniqueConstraint("student_id", "class_id", "attendance_date", name="uq_attendance_student_class_date"),
+        # Keyset pagination of GET /attendance (newest first) and per-class listings
+        Index("ix_attendance_marked_at_id", "marked_at", "id"),
+        Index("ix_attendance_class_date", "class_id", "attendance_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     student_id = Column(Integer, ForeignKey("users.id"))
     class_id = Column(Integer, ForeignKey("classes.id"))
     status = Column(String, default="absent")
-    marked_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+    marked_at = Column(TIMESTAMP(timezone=True), nullable=False, server_default=text('now()'))
+    attendance_date = Column(Date, nullable=False, server_default=text(attendance_day_sql("now()")))
 
     student = relationship("User", back_populates="attendance_records")
     class_ = relationship("Class", back_populates="attendance_records")
 
 
+# ---------------------
+# FACE EMBEDDINGS TABLE
+# ---------------------
+class FaceEmbedding(Base):
+    __tablename__ = "face_embeddings"
+    # One row per photo per model; uploading the same photo again is a no-op
+    __table_args__ = (
+        UniqueConstraint("user_id", "model_name", "source_hash", name="uq_face_embedding_user_model_source"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    model_name = Column(String, nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # dim little-endian float32 values
+    source_hash = Column(String(64), nullable=False)  # sha256 of the photo it came from
+    created_at = Column(TIMESTAMP(timezone=True), server_default=text('now()'))
+
+    user = relationship("User", back_populates="face_embeddings")
+
+
 # ---------------------
 # SCHEDULE TABLE
 # ---------------------
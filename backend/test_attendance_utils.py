@@ -0,0 +1,70 @@
+import base64
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from backend.attendance_utils import (
+    ATTENDANCE_TIMEZONE,
+    ATTENDANCE_TZ,
+    attendance_day,
+    attendance_day_sql,
+    attendance_instant,
+    decode_attendance_cursor,
+    encode_attendance_cursor,
+)
+
+
+@pytest.mark.parametrize("marked_at", [
+    datetime(2025, 11, 3, 9, 15, 2, 123456, tzinfo=timezone.utc),
+    datetime(2025, 11, 3, 14, 45, tzinfo=timezone(timedelta(hours=5, minutes=30))),
+    datetime(2025, 11, 3, 9, 15),
+])
+def test_cursor_round_trip(marked_at):
+    cursor = encode_attendance_cursor(marked_at, 4711)
+    assert decode_attendance_cursor(cursor) == (marked_at, 4711)
+    # Safe to put in a query string as it is
+    assert all(c.isalnum() or c in "-_=" for c in cursor)
+
+
+def test_cursor_keeps_the_time_zone():
+    ist = datetime(2025, 11, 3, 14, 45, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+    decoded, _ = decode_attendance_cursor(encode_attendance_cursor(ist, 1))
+    assert decoded.utcoffset() == timedelta(hours=5, minutes=30)
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not base64!",
+    "bm8gc2VwYXJhdG9y",  # "no separator"
+    base64.urlsafe_b64encode(b"2025-01-01T00:00:00|x").decode(),  # id isn't a number
+    base64.urlsafe_b64encode(b"yesterday|1").decode(),
+    "__8=",  # bytes that aren't UTF-8
+])
+def test_bad_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_attendance_cursor(cursor)
+
+
+# --- ATTENDANCE DAY ---
+def test_attendance_day_is_counted_in_the_attendance_zone():
+    before_midnight = datetime(2025, 11, 3, 23, 59, tzinfo=ATTENDANCE_TZ)
+    assert attendance_day(before_midnight).day == 3
+    assert attendance_day(before_midnight + timedelta(minutes=2)).day == 4
+    # The same instant written in another zone is the same day
+    assert attendance_day(before_midnight.astimezone(timezone.utc)) == attendance_day(before_midnight)
+
+
+@pytest.mark.skipif(ATTENDANCE_TIMEZONE != "Asia/Kolkata", reason="checks the default zone")
+def test_utc_evening_is_next_day_in_ist():
+    # 19:00 UTC is 00:30 IST: a mark from a UTC clock counts for the Indian date
+    assert attendance_day(datetime(2025, 11, 3, 19, 0, tzinfo=timezone.utc)).day == 4
+    assert attendance_day_sql("marked_at") == "((marked_at) AT TIME ZONE 'Asia/Kolkata')::date"
+
+
+def test_naive_and_missing_times():
+    naive = datetime(2025, 11, 3, 23, 59)
+    assert attendance_instant(naive).tzinfo is ATTENDANCE_TZ
+    assert attendance_day(naive).day == 3
+    now = attendance_instant()
+    assert now.tzinfo is not None
+    assert attendance_day() == now.astimezone(ATTENDANCE_TZ).date()